@@ -0,0 +1,110 @@
+# backend/answer_key.py
+"""
+Normalized question rows and compiled answer keys for grading.
+
+A quiz's questions are stored twice: as the original JSON blob in
+`quizzes.data` (what the editor and exports read back) and as one typed row
+per question in the `questions` table, keyed by (quiz_id, position). The
+rows already carry the normalized expected answer, so grading never parses
+JSON: `get_answer_key` compiles a quiz's rows into a {position: answer}
+dict once per quiz version and keeps it in memory until `update_quiz`
+bumps the version.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from db import connection
+
+ANSWER_KEY_CACHE_SIZE = int(os.environ.get("ANSWER_KEY_CACHE_SIZE", "1024"))
+
+
+def normalize_answer(value):
+    return str(value).strip().lower()
+
+
+def question_rows(quiz_id, qa_pairs):
+    """
+    (quiz_id, position, kind, question, answer, answer_norm, options) rows
+    for every stored question shape: (question, answer) pairs, dicts with
+    an optional options list, or bare strings.
+    """
+    rows = []
+    for position, item in enumerate(qa_pairs):
+        options = None
+        if isinstance(item, (list, tuple)):
+            question = item[0] if item else ""
+            answer   = item[1] if len(item) >= 2 else ""
+            kind     = "open"
+        elif isinstance(item, dict):
+            question = item.get("question", "")
+            answer   = item.get("answer", "")
+            options  = item.get("options") or None
+            kind     = item.get("type") or ("mc" if options else "open")
+        else:
+            question, answer, kind = item, "", "open"
+        rows.append((
+            quiz_id, position, kind,
+            str(question).strip(),
+            None if answer is None else str(answer),
+            normalize_answer(answer),
+            json.dumps(options) if options else None,
+        ))
+    return rows
+
+
+class AnswerKey:
+    __slots__ = ("quiz_id", "version", "answers", "kinds", "total", "vectors")
+
+    def __init__(self, quiz_id, version, rows):
+        self.quiz_id = quiz_id
+        self.version = version
+        # submissions key answers by the question index as a string
+        self.answers = {str(r["position"]): r["answer_norm"] for r in rows}
+        self.kinds   = {str(r["position"]): r["kind"] for r in rows}
+        self.total   = len(rows)
+        # answer embeddings, filled in lazily by the grading engine
+        self.vectors = None
+
+    def grade(self, answers):
+        """Number of exactly matching answers in a {position: answer} dict."""
+        return sum(
+            1 for pos, expected in self.answers.items()
+            if normalize_answer(answers.get(pos, "")) == expected
+        )
+
+
+_lock  = threading.Lock()
+_cache = OrderedDict()
+
+
+def get_answer_key(quiz_id):
+    """The quiz's compiled key, rebuilt only when its version changed; None if no such quiz."""
+    with connection() as conn:
+        row = conn.execute("SELECT id, version FROM quizzes WHERE id = ?", (quiz_id,)).fetchone()
+        if not row:
+            return None
+        quiz_id, version = row["id"], row["version"]
+        with _lock:
+            key = _cache.get(quiz_id)
+            if key is not None and key.version == version:
+                _cache.move_to_end(quiz_id)
+                return key
+        rows = conn.execute(
+            "SELECT position, kind, answer_norm FROM questions WHERE quiz_id = ? ORDER BY position",
+            (quiz_id,)
+        ).fetchall()
+
+    key = AnswerKey(quiz_id, version, rows)
+    with _lock:
+        _cache[quiz_id] = key
+        _cache.move_to_end(quiz_id)
+        while len(_cache) > ANSWER_KEY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return key
+
+
+def invalidate(quiz_id):
+    with _lock:
+        _cache.pop(quiz_id, None)
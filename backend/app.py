@@ -1,61 +1,54 @@
-import sqlite3
+import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
-def migrate_teachers_table(db_path="quizzes.db"):
-    """
-    Creates a `teachers` table and moves any role='teacher' rows
-    out of `students` into `teachers`.
-    """
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS teachers (
-            teacher_id TEXT PRIMARY KEY,
-            name       TEXT,
-            surname    TEXT,
-            email      TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    c.execute("""
-        INSERT OR IGNORE INTO teachers(teacher_id,name,surname,email)
-          SELECT student_id, name, surname, email
-          FROM students
-          WHERE role = 'teacher'
-    """)
-
-    c.execute("DELETE FROM students WHERE role = 'teacher'")
-
-    conn.commit()
-    conn.close()
-
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
  
-from topic_detection import TopicDetector
-from question_generation import QuestionGenerator
-from summarizer import summarize_text
+from model_registry import registry, get_question_generator, get_topic_detector
+from summarizer import get_summarization_service
 from upload_handler import handle_file_upload
 from quiz_routes import register_quiz_routes
 from student_routes import register_student_routes
 from util_routes import register_util_routes
+from health_routes import register_health_routes
+from generation_jobs import resume_pending_jobs
+from nlp_cache import cache
+from topic_detection import CASCADE_TOP_K, CASCADE_SKIP_MARGIN
+from distractor_index import get_distractor_index
+
+# default /api/detect mode. "hybrid" keeps the score scale the frontend's
+# threshold was tuned for; "cascade" (only runs zero-shot when it has to)
+# scores on a different scale, so it is opt-in per request or deployment
+DETECT_METHOD = os.environ.get("DETECT_METHOD", "hybrid")
 
 from classes import classes_bp
 from class_students import class_students_bp
 from students import students_bp
 from student_detail import student_detail_bp
 
-detector  = TopicDetector("topic_keywords_100plus_expanded.json")
-generator = QuestionGenerator("question_templates_expanded.json")
+# cheap to construct: their models are loaded on first use or by warmup
+registry.init_app(app)
+detector  = get_topic_detector("topic_keywords_100plus_expanded.json")
+generator = get_question_generator("question_templates_expanded.json")
 
 register_quiz_routes(app)
 register_util_routes(app)
 register_student_routes(app)
+register_health_routes(app)
 handle_file_upload(app)
 
+# precompute the topic and distractor embedding matrices once MiniLM is up
+registry.after_warmup(detector.sync_topic_embeddings)
+registry.after_warmup(get_distractor_index("topic_keywords_100plus_expanded.json").sync)
+
+def start_background_services():
+    # MODEL_WARMUP=0 disables warmup; models then load on first request
+    if os.environ.get("MODEL_WARMUP", "1") == "1":
+        registry.warmup(background=True)
+    # pick up generation jobs left queued/running by a previous process
+    resume_pending_jobs()
+
 
 
 
@@ -65,10 +58,12 @@ def generate_from_text():
     text      = data.get("text", "")
     open_n    = int(data.get("openCount", 5))  
     mc_n      = int(data.get("mcCount",   5))
-    questions = qg.generate_questions(
-        source_text=text,
-        num_open=open_n,
-        num_mc=mc_n
+    questions = generator.generate_questions(
+        topic=data.get("topic", ""),
+        content=text,
+        num_questions=open_n + mc_n,
+        open_count=open_n,
+        mc_count=mc_n
     )
     return jsonify({ "questions": questions })
 
@@ -76,15 +71,56 @@ def generate_from_text():
 
 @app.route("/api/detect", methods=["POST"])
 def detect():
-    data = request.json or {}
-    return jsonify(detector.detect_topics(data.get("text", "")))
+    data   = request.json or {}
+    text   = data.get("text", "")
+    method = data.get("method", DETECT_METHOD)
+    top_n  = int(data.get("top_n", 3))
+    opts   = {}
+    if method == "cascade":
+        opts["top_k"] = int(data.get("top_k", CASCADE_TOP_K))
+        opts["confidence_threshold"] = float(
+            data.get("confidence_threshold", CASCADE_SKIP_MARGIN)
+        )
+    return jsonify(cache.memoize(
+        "detect", text,
+        lambda: detector.detect_topics(text, method=method, top_n=top_n, **opts),
+        refresh=bool(data.get("fresh")),
+        method=method, top_n=top_n, **opts,
+        models=["facebook/bart-large-mnli", "all-MiniLM-L6-v2"],
+        keywords=detector.keywords_version
+    ))
 
 
 @app.route("/api/summarize", methods=["POST"])
 def summarize():
     data = request.json or {}
-    return jsonify({"summary": summarize_text(data.get("text", ""))})
+    text = data.get("text", "")
+    try:
+        service = get_summarization_service(data.get("model"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # "report": true summarizes the whole text hierarchically and returns the
+    # per-chunk cost; by default only the head is summarized, as before
+    if data.get("report"):
+        return jsonify(service.summarize_cached(
+            text,
+            max_length=int(data.get("max_length", 150)),
+            min_length=int(data.get("min_length", 50)),
+            refresh=bool(data.get("fresh"))
+        ))
+    summary = service.summarize_head_cached(
+        text,
+        max_length=int(data.get("max_length", 300)),
+        min_length=int(data.get("min_length", 80)),
+        refresh=bool(data.get("fresh"))
+    )
+    return jsonify({"summary": summary})
 
 
 if __name__ == "__main__":
+    # with the debug reloader only the serving child process runs these
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     app.run(debug=True)
+else:
+    start_background_services()
@@ -0,0 +1,215 @@
+# backend/db.py
+"""
+Shared SQLite data access for every backend module.
+
+Connections are opened once, tuned once and pooled per database file:
+
+    journal_mode=WAL       readers no longer block the writer (and vice versa)
+    synchronous=NORMAL     safe with WAL, far fewer fsyncs than FULL
+    busy_timeout           writers wait for the lock instead of failing with
+                           "database is locked"
+    mmap_size              reads come straight from the page cache
+    cached_statements      per-connection prepared-statement cache
+
+A thread holds at most one connection per database at a time: nested
+`connection()` / `transaction()` blocks reuse it, and it goes back to the
+pool when the outermost block exits. `transaction()` commits on success and
+rolls back on error; nested transactions become savepoints.
+
+Flask routes that use `get_db()` keep one pooled connection for the whole
+request, with the behaviour they were written against: TIMESTAMP columns
+parse to datetimes and writes stay pending until `db.commit()`.
+
+    with transaction() as conn:
+        conn.execute("UPDATE quizzes SET active = 0 WHERE id = ?", (quiz_id,))
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH              = os.environ.get("QUIZ_DB_PATH", "quizzes.db")
+DB_POOL_SIZE         = int(os.environ.get("DB_POOL_SIZE", "16"))
+DB_BUSY_TIMEOUT_MS   = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "10000"))
+DB_MMAP_BYTES        = int(os.environ.get("DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+DB_CACHE_KIB         = int(os.environ.get("DB_CACHE_KIB", "16384"))
+DB_STATEMENT_CACHE   = int(os.environ.get("DB_STATEMENT_CACHE", "256"))
+
+
+def connect(path=DB_PATH, request_style=False):
+    """
+    A new, fully configured connection; rows are sqlite3.Row. By default it
+    autocommits and transactions are explicit (see transaction()).
+    request_style=True gives get_db()'s implicit transactions and datetimes.
+    """
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+        isolation_level="" if request_style else None,
+        check_same_thread=False,           # pooled connections move between threads
+        cached_statements=DB_STATEMENT_CACHE,
+        detect_types=sqlite3.PARSE_DECLTYPES if request_style else 0,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_BYTES}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=DB_POOL_SIZE, request_style=False):
+        self.path   = path
+        self.size   = size
+        self.request_style = request_style
+        self._idle  = queue.LifoQueue(maxsize=size)
+        self._local = threading.local()
+        self._lock  = threading.Lock()
+        self._stats = {"opened": 0, "reused": 0, "closed": 0}
+
+    def _acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            self._stats["reused"] += 1
+            return conn
+        except queue.Empty:
+            with self._lock:
+                self._stats["opened"] += 1
+            return connect(self.path, self.request_style)
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            # a block exited mid-transaction without committing
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+            with self._lock:
+                self._stats["closed"] += 1
+
+    @contextmanager
+    def connection(self):
+        """This thread's connection, checked out for the duration of the block."""
+        local = self._local
+        if getattr(local, "conn", None) is not None:
+            local.depth += 1
+            try:
+                yield local.conn
+            finally:
+                local.depth -= 1
+            return
+
+        conn = self._acquire()
+        local.conn, local.depth = conn, 1
+        try:
+            yield conn
+        finally:
+            local.conn, local.depth = None, 0
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """
+        Commit on success, roll back on error. immediate=True takes the write
+        lock up front (BEGIN IMMEDIATE) for read-then-write sequences.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                name = f"sp_{id(conn)}_{self._local.depth}"
+                conn.execute(f"SAVEPOINT {name}")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute(f"ROLLBACK TO {name}")
+                    conn.execute(f"RELEASE {name}")
+                    raise
+                conn.execute(f"RELEASE {name}")
+                return
+
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def stats(self):
+        return {"path": self.path, "request_style": self.request_style, "idle": self._idle.qsize(), "size": self.size, **self._stats}
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools_lock = threading.Lock()
+_pools = {}
+
+
+def get_pool(path=None, request_style=False):
+    key = (os.path.abspath(path or DB_PATH), request_style)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(key[0], request_style=request_style)
+        return _pools[key]
+
+
+def connection(path=None):
+    return get_pool(path).connection()
+
+
+def transaction(path=None, immediate=False):
+    return get_pool(path).transaction(immediate=immediate)
+
+
+def pool_stats():
+    with _pools_lock:
+        return [p.stats() for p in _pools.values()]
+
+
+# ─── FLASK INTEGRATION ───────────────────────────────────────────────────────
+def get_db():
+    """
+    The request's pooled connection; returned to the pool at teardown,
+    rolling back anything that was not committed.
+    """
+    from flask import g, current_app
+    if "db" not in g:
+        ctx = get_pool(current_app.config.get("DATABASE", DB_PATH), request_style=True).connection()
+        g.db = ctx.__enter__()
+        g._db_ctx = ctx
+    return g.db
+
+
+def request_transaction(immediate=False):
+    """
+    transaction() on the request's own connection (the one get_db() returns):
+    commits when the block exits cleanly, rolls back if it raises.
+    """
+    from flask import current_app
+    get_db()
+    pool = get_pool(current_app.config.get("DATABASE", DB_PATH), request_style=True)
+    return pool.transaction(immediate=immediate)
+
+
+def close_db(e=None):
+    from flask import g
+    ctx = g.pop("_db_ctx", None)
+    g.pop("db", None)
+    if ctx is not None:
+        ctx.__exit__(None, None, None)
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
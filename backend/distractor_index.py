@@ -0,0 +1,102 @@
+# backend/distractor_index.py
+"""
+Nearest-neighbour distractor selection for multiple-choice conversion.
+
+Every keyword in the topic keyword file is embedded once into a shared
+EmbeddingIndex. Distractors for a batch of answers are the keywords whose
+cosine similarity to each answer falls inside a band: close enough to be
+plausible, not so close that they are a synonym of the correct answer.
+All answers of a quiz are scored in one matrix product.
+"""
+import os
+import threading
+
+import numpy as np
+
+from embedding_index import EmbeddingIndex, encode_texts
+from keyword_index import get_keyword_index
+
+DISTRACTOR_MIN_SIM = float(os.environ.get("DISTRACTOR_MIN_SIM", "0.25"))
+DISTRACTOR_MAX_SIM = float(os.environ.get("DISTRACTOR_MAX_SIM", "0.85"))
+
+
+class DistractorIndex:
+    def __init__(self, topic_file):
+        self.topic_file = topic_file
+        self.embeddings = EmbeddingIndex()
+        self._synced_for = None
+
+    def sync(self):
+        """Embed keywords added to the topic file since the last call."""
+        keyword_index = get_keyword_index(self.topic_file)
+        if keyword_index is self._synced_for:
+            return
+        seen, items = set(), []
+        for keywords in keyword_index.topic_keywords.values():
+            for kw in keywords:
+                if kw.lower() not in seen:
+                    seen.add(kw.lower())
+                    items.append((kw, kw))
+        self.embeddings.sync(items)
+        self._synced_for = keyword_index
+
+    def select(self, answers, k,
+               min_sim=DISTRACTOR_MIN_SIM, max_sim=DISTRACTOR_MAX_SIM):
+        """
+        For each answer, up to k distractors ordered by similarity (nearest
+        first) within [min_sim, max_sim]. Rows may come back short when too
+        few keywords fall inside the band.
+        """
+        if not answers or k <= 0:
+            return [[] for _ in answers]
+        self.sync()
+
+        # one snapshot; a concurrent sync may have grown either side since
+        labels, matrix = self.embeddings.labels, self.embeddings.matrix
+        if matrix is None:
+            return [[] for _ in answers]
+        n = min(len(labels), matrix.shape[0])
+        if not n:
+            return [[] for _ in answers]
+        labels, matrix = labels[:n], matrix[:n]
+
+        sims = encode_texts(answers) @ matrix.T          # (answers, keywords)
+        sims = np.where((sims >= min_sim) & (sims <= max_sim), sims, -np.inf)
+
+        # over-fetch a little so exact/substring matches can be dropped
+        fetch = min(len(labels), k * 3)
+        top = np.argpartition(-sims, fetch - 1, axis=1)[:, :fetch]
+
+        out = []
+        for row, answer in enumerate(answers):
+            correct = answer.strip().lower()
+            order = top[row][np.argsort(-sims[row, top[row]])]
+            picked, seen = [], {correct}
+            for idx in order:
+                if not np.isfinite(sims[row, idx]):
+                    break
+                cand = labels[idx]
+                low = cand.lower()
+                if low in seen or (correct and (low in correct or correct in low)):
+                    continue
+                seen.add(low)
+                picked.append(cand)
+                if len(picked) >= k:
+                    break
+            out.append(picked)
+        return out
+
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+def get_distractor_index(topic_file="topic_keywords_100plus_expanded.json"):
+    topic_file = os.path.abspath(topic_file)
+    index = _indexes.get(topic_file)
+    if index is not None:
+        return index
+    with _lock:
+        if topic_file not in _indexes:
+            _indexes[topic_file] = DistractorIndex(topic_file)
+        return _indexes[topic_file]
@@ -0,0 +1,73 @@
+# backend/embedding_index.py
+"""
+Precomputed MiniLM embeddings held as one L2-normalized NumPy matrix.
+
+Labels are encoded once and appended incrementally when new ones show up,
+so scoring a query against every label is a single matrix-vector product.
+"""
+import threading
+
+import numpy as np
+
+from inference_scheduler import embed
+
+
+def encode_texts(texts):
+    """Encode texts with the shared MiniLM model into unit-length rows."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    # goes through the micro-batching scheduler, shared with other requests
+    return normalize_rows(np.asarray(embed(list(texts)), dtype=np.float32))
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingIndex:
+    def __init__(self, encode=encode_texts):
+        self._encode = encode
+        self._lock = threading.Lock()
+        self.labels = []
+        self.positions = {}
+        self.matrix = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def sync(self, items):
+        """
+        Make sure every (label, text) pair in `items` is embedded. Only the
+        labels not seen before are encoded; existing rows are kept.
+        """
+        missing = [(l, t) for l, t in items if l not in self.positions]
+        if not missing:
+            return 0
+        with self._lock:
+            missing = [(l, t) for l, t in missing if l not in self.positions]
+            if not missing:
+                return 0
+            vecs = self._encode([t for _, t in missing])
+            matrix = vecs if self.matrix is None else np.vstack([self.matrix, vecs])
+            labels = self.labels + [l for l, _ in missing]
+            # publish the new matrix before the label map, so readers never
+            # see a label whose row is not there yet
+            self.matrix = matrix
+            self.labels = labels
+            self.positions = {l: i for i, l in enumerate(labels)}
+            return len(missing)
+
+    def score(self, query_vec):
+        """
+        Cosine similarity of a unit-length query against every label, as
+        (labels, scores). Rows are only ever appended, so zipping a label
+        snapshot with a matrix snapshot always pairs them correctly.
+        """
+        labels, matrix = self.labels, self.matrix
+        if matrix is None:
+            return [], np.zeros(0, dtype=np.float32)
+        sims = matrix @ query_vec
+        n = min(len(labels), len(sims))
+        return labels[:n], sims[:n]
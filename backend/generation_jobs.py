@@ -0,0 +1,303 @@
+# backend/generation_jobs.py
+"""
+Asynchronous quiz-generation jobs.
+
+A job is a row in the `generation_jobs` table of quizzes.db, so its state
+survives restarts. A bounded thread pool runs
+`QuestionGenerator.generate_questions` for queued jobs and writes progress,
+partial results and per-stage timings back to the row as it goes.
+
+A worker claims a job with one conditional UPDATE (queued -> running) and
+stamps it with its WORKER_ID; while it runs, a heartbeat thread refreshes
+`heartbeat_at`. Only running jobs whose heartbeat is older than
+JOB_STALE_SECONDS are requeued at startup, so several processes can share
+the table without running the same job twice. Cancellation is a flag on
+the row that the owning worker reads at each progress report.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from db import connection, transaction
+from migrations import migrate
+from model_registry import registry, get_question_generator
+
+JOB_WORKERS     = int(os.environ.get("GEN_JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.environ.get("GEN_JOB_QUEUE_LIMIT", "32"))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("GEN_JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS     = float(os.environ.get("GEN_JOB_STALE_SECONDS", "120"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+_lock      = threading.Lock()
+_executor  = None
+_heartbeat = None
+_stopping  = threading.Event()
+
+
+def init_jobs_table():
+    """The generation_jobs table is created by migration 6; make sure it has run."""
+    migrate()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, JOB_WORKERS),
+                thread_name_prefix="generation-job"
+            )
+        _start_heartbeat()
+        return _executor
+
+
+def _start_heartbeat():
+    """Keep heartbeat_at fresh for every job this process is running."""
+    global _heartbeat
+    if _heartbeat is not None and _heartbeat.is_alive():
+        return
+
+    def _beat():
+        while not _stopping.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                with transaction() as conn:
+                    conn.execute(
+                        "UPDATE generation_jobs SET heartbeat_at = ? "
+                        "WHERE owner = ? AND status = 'running'",
+                        (time.time(), WORKER_ID)
+                    )
+            except Exception as e:
+                print(f"[WARN] Generation job heartbeat failed: {e}")
+    _heartbeat = threading.Thread(target=_beat, name="generation-job-heartbeat", daemon=True)
+    _heartbeat.start()
+
+
+def _update(job_id, **fields):
+    """Write fields of a job this worker owns; False if it no longer owns it."""
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    with transaction() as conn:
+        cur = conn.execute(
+            f"UPDATE generation_jobs SET {cols} WHERE id = ? AND owner = ?",
+            (*fields.values(), job_id, WORKER_ID)
+        )
+        return cur.rowcount > 0
+
+
+# ─── PUBLIC API ──────────────────────────────────────────────────────────────
+def submit_job(params):
+    job_id = uuid.uuid4().hex
+    # count and insert under one write lock so concurrent submits respect the limit
+    with transaction(immediate=True) as conn:
+        queued = conn.execute(
+            "SELECT COUNT(*) FROM generation_jobs WHERE status IN ('queued', 'running')"
+        ).fetchone()[0]
+        if queued >= JOB_QUEUE_LIMIT:
+            raise JobQueueFull(f"{queued} generation jobs already pending")
+        conn.execute(
+            "INSERT INTO generation_jobs (id, params, timings) VALUES (?, ?, ?)",
+            (job_id, json.dumps(params), json.dumps({"enqueued": time.time()}))
+        )
+
+    _get_executor().submit(_run_job, job_id)
+    return job_id
+
+
+def get_job(job_id):
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT * FROM generation_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    if not row:
+        return None
+
+    timings = json.loads(row["timings"] or "{}")
+    timings.pop("enqueued", None)
+    job = {
+        "job_id":      row["id"],
+        "status":      row["status"],
+        "progress":    row["progress"],
+        "partial":     json.loads(row["partial"] or "[]"),
+        "timings":     timings,
+        "error":       row["error"],
+        "created_at":  row["created_at"],
+        "started_at":  row["started_at"],
+        "finished_at": row["finished_at"],
+    }
+    if row["result"]:
+        job["result"] = json.loads(row["result"])
+    return job
+
+
+def cancel_job(job_id):
+    with transaction(immediate=True) as conn:
+        row = conn.execute(
+            "SELECT status FROM generation_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+
+        status = row["status"]
+        if status == "queued":
+            status = "cancelled"
+            conn.execute(
+                "UPDATE generation_jobs SET status = 'cancelled', cancel_requested = 1, "
+                "finished_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'queued'",
+                (job_id,)
+            )
+        elif status == "running":
+            # the owning worker, in whichever process, sees it at its next progress report
+            conn.execute(
+                "UPDATE generation_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,)
+            )
+    return status
+
+
+def resume_pending_jobs():
+    """
+    Submit queued jobs, after requeueing running jobs whose owner stopped
+    sending heartbeats. Jobs another live worker is running are left alone.
+    """
+    with transaction(immediate=True) as conn:
+        conn.execute(
+            "UPDATE generation_jobs SET status = 'queued', progress = 0, partial = NULL, "
+            "owner = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (time.time() - JOB_STALE_SECONDS,)
+        )
+        ids = [r["id"] for r in conn.execute(
+            "SELECT id FROM generation_jobs WHERE status = 'queued' ORDER BY created_at"
+        )]
+    for job_id in ids:
+        _get_executor().submit(_run_job, job_id)
+    return len(ids)
+
+
+def shutdown_jobs():
+    global _executor
+    _stopping.set()
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+registry.on_shutdown(shutdown_jobs)
+
+
+# ─── WORKER ──────────────────────────────────────────────────────────────────
+def _claim(job_id, started):
+    """Atomically move a queued job to running under this worker; its row, or None."""
+    with transaction() as conn:
+        cur = conn.execute(
+            "UPDATE generation_jobs SET status = 'running', owner = ?, heartbeat_at = ?, "
+            "started_at = ? WHERE id = ? AND status = 'queued' AND cancel_requested = 0",
+            (WORKER_ID, started, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(started)), job_id)
+        )
+        if cur.rowcount == 0:
+            # someone else claimed it, or it was cancelled before it started
+            conn.execute(
+                "UPDATE generation_jobs SET status = 'cancelled', "
+                "finished_at = CURRENT_TIMESTAMP "
+                "WHERE id = ? AND status = 'queued' AND cancel_requested = 1",
+                (job_id,)
+            )
+            return None
+        return conn.execute(
+            "SELECT params, timings FROM generation_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+
+
+def _cancel_requested(job_id):
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT cancel_requested FROM generation_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return bool(row and row["cancel_requested"])
+
+
+def _run_job(job_id):
+    started = time.time()
+    row = _claim(job_id, started)
+    if not row:
+        return
+
+    params  = json.loads(row["params"])
+    timings = {
+        "queued_seconds": round(started - json.loads(row["timings"] or "{}").get("enqueued", started), 3),
+        "stages": {},
+    }
+    total = max(1, int(params.get("num_questions", 10)))
+
+    last = [started]
+    def progress(stage, items):
+        now = time.time()
+        timings["stages"][stage] = round(
+            timings["stages"].get(stage, 0) + now - last[0], 3
+        )
+        last[0] = now
+        if items and "first_question_seconds" not in timings:
+            timings["first_question_seconds"] = round(now - started, 3)
+        owned = _update(
+            job_id,
+            progress=min(1.0, len(items) / total),
+            partial=json.dumps(items),
+            timings=json.dumps(timings),
+            heartbeat_at=now,
+        )
+        # cancel_job may have run in another process: the row is the source of truth
+        if not owned or _cancel_requested(job_id):
+            raise JobCancelled(job_id)
+
+    try:
+        qg = get_question_generator()
+        questions = qg.generate_questions(
+            topic=params.get("topic", ""),
+            content=params.get("text", ""),
+            num_questions=total,
+            open_count=params.get("open_count"),
+            mc_count=params.get("mc_count"),
+            progress_cb=progress,
+            decoding=params.get("decoding")
+        )
+        result = {"questions": questions}
+        if params.get("with_summary"):
+            t0 = time.time()
+            result["summary"] = qg.summarize(params.get("text", ""))
+            timings["stages"]["summary"] = round(time.time() - t0, 3)
+
+        timings["total_seconds"] = round(time.time() - started, 3)
+        _update(
+            job_id,
+            status="completed",
+            progress=1.0,
+            result=json.dumps(result),
+            timings=json.dumps(timings),
+            finished_at=time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        )
+    except JobCancelled:
+        timings["total_seconds"] = round(time.time() - started, 3)
+        _update(
+            job_id, status="cancelled", timings=json.dumps(timings),
+            finished_at=time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        )
+    except Exception as e:
+        print(f"[ERROR] Generation job {job_id} failed: {e}")
+        timings["total_seconds"] = round(time.time() - started, 3)
+        _update(
+            job_id, status="failed", error=str(e), timings=json.dumps(timings),
+            finished_at=time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        )
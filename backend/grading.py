@@ -0,0 +1,205 @@
+# backend/grading.py
+"""
+Grading engine for quiz submissions.
+
+Multiple-choice answers must match the key exactly. An open answer that
+misses the exact match is still accepted when
+
+    fuzzy     its token overlap (Dice) with the expected answer reaches the
+              quiz's overlap_threshold, or
+    semantic  additionally, its MiniLM cosine similarity to the expected
+              answer reaches the quiz's semantic_threshold.
+
+Each quiz can set its own mode and thresholds in `grading_settings`; the
+GRADING_* environment variables are the defaults (exact matching unless a
+quiz opts in). Answer-key embeddings are
+computed once per quiz version and kept on the cached AnswerKey. Regrading
+a quiz embeds every distinct submitted answer in one batch and scores all
+of them with a single vectorized product.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from answer_key import get_answer_key, normalize_answer
+from db import connection, transaction
+from embedding_index import encode_texts
+
+GRADING_MODES              = ("exact", "fuzzy", "semantic")
+GRADING_MODE               = os.environ.get("GRADING_MODE", "exact")
+GRADING_OVERLAP_THRESHOLD  = float(os.environ.get("GRADING_OVERLAP_THRESHOLD", "0.8"))
+GRADING_SEMANTIC_THRESHOLD = float(os.environ.get("GRADING_SEMANTIC_THRESHOLD", "0.75"))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def token_overlap(given, expected):
+    """Dice coefficient of the two answers' word sets (both already normalized)."""
+    a, b = set(_TOKEN_RE.findall(given)), set(_TOKEN_RE.findall(expected))
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+# ─── SETTINGS ────────────────────────────────────────────────────────────────
+def get_settings(quiz_id):
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT mode, overlap_threshold, semantic_threshold FROM grading_settings WHERE quiz_id = ?",
+            (quiz_id,)
+        ).fetchone()
+    if row:
+        return dict(row)
+    return {
+        "mode":               GRADING_MODE,
+        "overlap_threshold":  GRADING_OVERLAP_THRESHOLD,
+        "semantic_threshold": GRADING_SEMANTIC_THRESHOLD,
+    }
+
+
+def set_settings(quiz_id, mode=None, overlap_threshold=None, semantic_threshold=None):
+    """Update a quiz's grading settings; unspecified fields keep their value."""
+    settings = get_settings(quiz_id)
+    if mode is not None:
+        if mode not in GRADING_MODES:
+            raise ValueError(f"unknown grading mode '{mode}'")
+        settings["mode"] = mode
+    for name, value in (("overlap_threshold", overlap_threshold),
+                        ("semantic_threshold", semantic_threshold)):
+        if value is not None:
+            value = float(value)
+            if not 0.0 <= value <= 1.0:
+                raise ValueError(f"{name} must be between 0 and 1")
+            settings[name] = value
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO grading_settings "
+            "(quiz_id, mode, overlap_threshold, semantic_threshold, updated_at) "
+            "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            (quiz_id, settings["mode"], settings["overlap_threshold"], settings["semantic_threshold"])
+        )
+    return settings
+
+
+# ─── SCORING ─────────────────────────────────────────────────────────────────
+# cached AnswerKeys are shared across requests; embed each one only once
+_vectors_lock = threading.Lock()
+
+
+def _key_vectors(key):
+    """(position -> row, unit-length matrix) for the key's open answers."""
+    if key.vectors is None:
+        with _vectors_lock:
+            if key.vectors is None:
+                positions = [
+                    pos for pos, expected in key.answers.items()
+                    if expected and key.kinds.get(pos) != "mc"
+                ]
+                matrix = encode_texts([key.answers[pos] for pos in positions])
+                key.vectors = ({pos: i for i, pos in enumerate(positions)}, matrix)
+    return key.vectors
+
+
+def _similarities(key, pairs):
+    """Cosine similarity of each (position, given) pair to the expected answer."""
+    index, matrix = _key_vectors(key)
+    texts = list(dict.fromkeys(given for _, given in pairs))
+    given_vecs = encode_texts(texts)
+    row_of = {t: i for i, t in enumerate(texts)}
+    g = given_vecs[[row_of[given] for _, given in pairs]]
+    k = matrix[[index[pos] for pos, _ in pairs]]
+    return np.einsum("ij,ij->i", g, k)
+
+
+def grade_many(key, submissions, settings):
+    """
+    Correct-answer counts for a list of {position: answer} dicts. All
+    answers that need the semantic check are embedded together.
+    """
+    mode = settings["mode"]
+    correct = [0] * len(submissions)
+    pending = []    # (submission, position, normalized answer)
+    for i, answers in enumerate(submissions):
+        for pos, expected in key.answers.items():
+            given = normalize_answer(answers.get(pos, ""))
+            if given == expected:
+                correct[i] += 1
+            elif mode == "exact" or key.kinds.get(pos) == "mc" or not given or not expected:
+                continue
+            elif token_overlap(given, expected) >= settings["overlap_threshold"]:
+                correct[i] += 1
+            elif mode == "semantic":
+                pending.append((i, pos, given))
+
+    if pending:
+        try:
+            sims = _similarities(key, [(pos, given) for _, pos, given in pending])
+        except Exception as e:
+            # no embeddings: fall back to the fuzzy result
+            print(f"[WARN] Semantic grading unavailable for quiz {key.quiz_id}: {e}")
+            sims = np.zeros(len(pending))
+        threshold = settings["semantic_threshold"]
+        for (i, _, _), sim in zip(pending, sims):
+            if sim >= threshold:
+                correct[i] += 1
+    return correct
+
+
+def _percent(correct, total):
+    return round((correct / total) * 100) if total else 0
+
+
+def grade_submission(quiz_id, answers):
+    """{"correct", "total", "score", "mode"} for one submission; None if no such quiz."""
+    key = get_answer_key(quiz_id)
+    if key is None:
+        return None
+    settings = get_settings(key.quiz_id)
+    correct = grade_many(key, [answers], settings)[0]
+    return {
+        "correct": correct,
+        "total":   key.total,
+        "score":   _percent(correct, key.total),
+        "mode":    settings["mode"],
+    }
+
+
+def regrade_quiz(quiz_id):
+    """
+    Re-score every completed submission of a quiz under its current key and
+    settings, in one batch and one transaction. None if no such quiz.
+    """
+    started = time.perf_counter()
+    key = get_answer_key(quiz_id)
+    if key is None:
+        return None
+    settings = get_settings(key.quiz_id)
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT id, score, answers FROM assignments "
+            "WHERE quiz_id = ? AND status = 'completed'",
+            (key.quiz_id,)
+        ).fetchall()
+
+    submissions = []
+    for r in rows:
+        try:
+            submissions.append(json.loads(r["answers"] or "{}"))
+        except ValueError:
+            submissions.append({})
+    scores = [_percent(c, key.total) for c in grade_many(key, submissions, settings)]
+
+    changed = [(score, r["id"]) for r, score in zip(rows, scores) if score != r["score"]]
+    with transaction() as conn:
+        conn.executemany("UPDATE assignments SET score = ? WHERE id = ?", changed)
+    return {
+        "quiz_id":     key.quiz_id,
+        "mode":        settings["mode"],
+        "submissions": len(rows),
+        "changed":     len(changed),
+        "seconds":     round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,34 @@
+# backend/health_routes.py
+from flask import jsonify
+from model_registry import registry
+from inference_scheduler import scheduler_stats
+from db import pool_stats
+
+
+def register_health_routes(app):
+    # ─── LIVENESS: the process is up and serving requests ────────────────────
+    @app.route("/api/health/live", methods=["GET"])
+    def health_live():
+        return jsonify({"status": "ok"}), 200
+
+    # ─── READINESS: per-model load state ─────────────────────────────────────
+    @app.route("/api/health/ready", methods=["GET"])
+    def health_ready():
+        models   = registry.status()
+        required = app.config.get("READY_MODELS") or list(models)
+        ready    = all(models[name]["loaded"] for name in required if name in models)
+        return jsonify({
+            "status":  "ready" if ready else "warming",
+            "warming": registry.is_warming(),
+            "models":  models,
+        }), (200 if ready else 503)
+
+    # ─── INFERENCE SCHEDULER: per-model queue depth and batch sizes ──────────
+    @app.route("/api/health/inference", methods=["GET"])
+    def health_inference():
+        return jsonify(scheduler_stats()), 200
+
+    # ─── DATABASE: connection pool usage per SQLite file ─────────────────────
+    @app.route("/api/health/db", methods=["GET"])
+    def health_db():
+        return jsonify(pool_stats()), 200
@@ -0,0 +1,242 @@
+# backend/inference_backend.py
+"""
+Pluggable CPU inference backends for the flan-t5 and distilbert checkpoints.
+
+INFERENCE_BACKEND selects how the model registry builds them:
+  torch       eager fp32 PyTorch (default)
+  torch-int8  PyTorch with dynamic int8 quantization of every nn.Linear
+  onnx        ONNX Runtime sessions exported by this module (needs optimum)
+
+The ONNX artifacts are exported once and cached under ONNX_CACHE_DIR:
+
+    python inference_backend.py export            # export + int8-quantize
+    python inference_backend.py parity --backend onnx
+
+`parity` runs the same QA and generation prompts through the eager
+PyTorch models and the selected backend and reports agreement, latency
+and resident memory.
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+
+BACKENDS          = ("torch", "torch-int8", "onnx")
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+ONNX_CACHE_DIR    = os.environ.get("ONNX_CACHE_DIR", os.path.join("model_cache", "onnx"))
+
+QA_MODEL_ID       = "distilbert-base-cased-distilled-squad"
+FLAN_MODEL_ID     = "google/flan-t5-base"
+BART_CNN_MODEL_ID = "facebook/bart-large-cnn"
+
+
+def _check(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+    return backend
+
+
+def onnx_path(model_id):
+    return os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "__"))
+
+
+def _quantize_dynamic(model):
+    import torch
+    model = torch.quantization.quantize_dynamic(
+        model.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8
+    )
+    model.eval()
+    return model
+
+
+def _onnx_model(ort_cls, model_id):
+    path = onnx_path(model_id)
+    if not os.path.isdir(path):
+        raise RuntimeError(
+            f"No ONNX export for {model_id} in {path}; "
+            f"run `python inference_backend.py export` first"
+        )
+    return ort_cls.from_pretrained(path)
+
+
+# ─── LOADERS (used by the model registry) ────────────────────────────────────
+def load_qa_model(model_id=QA_MODEL_ID, backend=None):
+    """Returns (tokenizer, model) for extractive question answering."""
+    backend = _check(backend or INFERENCE_BACKEND)
+    from transformers import AutoTokenizer, AutoModelForQuestionAnswering
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForQuestionAnswering
+        return tokenizer, _onnx_model(ORTModelForQuestionAnswering, model_id)
+
+    model = AutoModelForQuestionAnswering.from_pretrained(model_id)
+    model.eval()
+    if backend == "torch-int8":
+        model = _quantize_dynamic(model)
+    return tokenizer, model
+
+
+def load_seq2seq_model(model_id=FLAN_MODEL_ID, backend=None):
+    """Returns (tokenizer, model) for a seq2seq checkpoint (flan-t5, bart)."""
+    backend = _check(backend or INFERENCE_BACKEND)
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        return tokenizer, _onnx_model(ORTModelForSeq2SeqLM, model_id)
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_id)
+    model.eval()
+    if backend == "torch-int8":
+        return tokenizer, _quantize_dynamic(model)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return tokenizer, model.to(device)
+
+
+def pipeline_device(model):
+    """HF pipeline `device` argument matching where `model` already lives."""
+    device = getattr(model, "device", None)
+    if device is not None and getattr(device, "type", "cpu") == "cuda":
+        return device.index or 0
+    return -1
+
+
+# ─── EXPORT TOOL ─────────────────────────────────────────────────────────────
+def export_onnx(model_ids=(QA_MODEL_ID, FLAN_MODEL_ID, BART_CNN_MODEL_ID), quantize=True):
+    """Export checkpoints to ONNX under ONNX_CACHE_DIR, optionally int8-quantized."""
+    from optimum.onnxruntime import (
+        ORTModelForQuestionAnswering, ORTModelForSeq2SeqLM, ORTQuantizer,
+    )
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    for model_id in model_ids:
+        path = onnx_path(model_id)
+        ort_cls = ORTModelForQuestionAnswering if model_id == QA_MODEL_ID else ORTModelForSeq2SeqLM
+        print(f"[INFO] Exporting {model_id} -> {path}")
+        t0 = time.perf_counter()
+        model = ort_cls.from_pretrained(model_id, export=True)
+        model.save_pretrained(path)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(path)
+
+        if quantize:
+            qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            onnx_files = [f for f in os.listdir(path) if f.endswith(".onnx")]
+            for name in onnx_files:
+                quantizer = ORTQuantizer.from_pretrained(path, file_name=name)
+                quantizer.quantize(save_dir=path, quantization_config=qconfig)
+                # replace the fp32 graph with its quantized twin
+                qname = name.replace(".onnx", "_quantized.onnx")
+                os.replace(os.path.join(path, qname), os.path.join(path, name))
+        print(f"[INFO] {model_id} exported in {time.perf_counter() - t0:.1f}s")
+
+
+# ─── PARITY CHECK ────────────────────────────────────────────────────────────
+_QA_SAMPLES = [
+    ("What is a neural network?",
+     "A neural network is a series of algorithms that recognizes underlying "
+     "relationships in a set of data through a process that mimics the way "
+     "the human brain operates."),
+    ("What does SQL stand for?",
+     "SQL, which stands for Structured Query Language, is used to communicate "
+     "with relational databases."),
+    ("Where is data stored in a blockchain?",
+     "A blockchain stores data in blocks that are linked together in a chain "
+     "and replicated across a peer-to-peer network."),
+]
+_GEN_SAMPLES = [
+    "Generate 3 educational questions with answers from this text:\n\n" + ctx
+    for _, ctx in _QA_SAMPLES
+]
+
+
+def _rss_mb():
+    """Current resident set size; falls back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _run_qa(backend):
+    from transformers import pipeline
+    rss0 = _rss_mb()
+    tokenizer, model = load_qa_model(backend=backend)
+    qa = pipeline("question-answering", model=model, tokenizer=tokenizer,
+                  device=pipeline_device(model))
+    rss = _rss_mb() - rss0
+    t0 = time.perf_counter()
+    out = [qa({"question": q, "context": c}) for q, c in _QA_SAMPLES]
+    return out, (time.perf_counter() - t0) / len(_QA_SAMPLES), rss
+
+
+def _run_gen(backend):
+    import torch
+    rss0 = _rss_mb()
+    tokenizer, model = load_seq2seq_model(backend=backend)
+    rss = _rss_mb() - rss0
+    outputs = []
+    t0 = time.perf_counter()
+    for prompt in _GEN_SAMPLES:
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        with torch.no_grad():
+            ids = model.generate(**inputs, max_new_tokens=64, num_beams=1)
+        outputs.append(tokenizer.decode(ids[0], skip_special_tokens=True))
+    return outputs, (time.perf_counter() - t0) / len(_GEN_SAMPLES), rss
+
+
+def parity_check(backend):
+    _check(backend)
+    ref_qa, ref_qa_lat, ref_qa_rss = _run_qa("torch")
+    ref_gen, ref_gen_lat, ref_gen_rss = _run_gen("torch")
+    gc.collect()
+
+    qa, qa_lat, qa_rss = _run_qa(backend)
+    gen, gen_lat, gen_rss = _run_gen(backend)
+
+    qa_match = sum(a["answer"] == b["answer"] for a, b in zip(ref_qa, qa))
+    max_score_diff = max(abs(a["score"] - b["score"]) for a, b in zip(ref_qa, qa))
+    gen_match = sum(a == b for a, b in zip(ref_gen, gen))
+    report = {
+        "backend":          backend,
+        "qa_answer_match":  f"{qa_match}/{len(qa)}",
+        "qa_max_score_diff": round(max_score_diff, 4),
+        "qa_latency_s":     {"torch": round(ref_qa_lat, 4), backend: round(qa_lat, 4)},
+        "gen_exact_match":  f"{gen_match}/{len(gen)}",
+        "gen_latency_s":    {"torch": round(ref_gen_lat, 4), backend: round(gen_lat, 4)},
+        "load_rss_mb":      {
+            "torch": round(ref_qa_rss + ref_gen_rss, 1),
+            backend: round(qa_rss + gen_rss, 1),
+        },
+    }
+    for ref, got in zip(ref_gen, gen):
+        if ref != got:
+            print(f"[DIFF] torch:   {ref}\n       {backend}: {got}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inference backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="export and cache ONNX artifacts")
+    exp.add_argument("--no-quantize", action="store_true")
+    par = sub.add_parser("parity", help="compare a backend against eager PyTorch")
+    par.add_argument("--backend", default=INFERENCE_BACKEND, choices=BACKENDS)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_onnx(quantize=not args.no_quantize)
+    else:
+        for key, value in parity_check(args.backend).items():
+            print(f"{key:>18}: {value}")
+
+
+if __name__ == "__main__":
+    main()
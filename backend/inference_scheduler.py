@@ -0,0 +1,242 @@
+# backend/inference_scheduler.py
+"""
+In-process dynamic micro-batching for the shared NLP models.
+
+Request threads no longer call the distilbert QA pipeline, the MiniLM
+embedder or the zero-shot classifier themselves. They hand their inputs to
+a per-model MicroBatcher and block; one worker thread per model collects
+work from every caller for up to INFER_BATCH_WAIT_MS or INFER_BATCH_MAX_ITEMS
+inputs, runs it through the model as one padded batch and hands each caller
+its slice of the results. A caller may ask for smaller batches (max_items);
+no batch that carries its inputs grows past that. Only that worker touches the model, so concurrent
+requests stop contending for the same CPU cores.
+
+INFER_MICRO_BATCHING=0 turns the scheduler off: callers then run their
+batch directly, as before.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from model_registry import registry
+
+INFER_MICRO_BATCHING  = os.environ.get("INFER_MICRO_BATCHING", "1") == "1"
+INFER_BATCH_WAIT_MS   = float(os.environ.get("INFER_BATCH_WAIT_MS", "5"))
+INFER_BATCH_MAX_ITEMS = int(os.environ.get("INFER_BATCH_MAX_ITEMS", "32"))
+
+
+class MicroBatcher:
+    def __init__(self, name, run_batch,
+                 max_items=INFER_BATCH_MAX_ITEMS, max_wait_ms=INFER_BATCH_WAIT_MS,
+                 enabled=INFER_MICRO_BATCHING):
+        """run_batch(items) -> one result per item, in order."""
+        self.name        = name
+        self.run_batch   = run_batch
+        self.max_items   = max(1, int(max_items))
+        self.max_wait    = max_wait_ms / 1000.0
+        self.enabled     = enabled
+        self._cond       = threading.Condition()
+        self._queue      = deque()         # (items, future, enqueued_at, max_items)
+        self._pending    = 0               # items waiting in the queue
+        self._worker     = None
+        self._stopped    = False
+        self._stats      = {
+            "batches": 0, "items": 0, "requests": 0, "errors": 0,
+            "max_batch_size": 0, "wait_seconds": 0.0, "run_seconds": 0.0,
+        }
+
+    # ─── CALLER SIDE ─────────────────────────────────────────────────────────
+    def submit(self, items, max_items=None):
+        """
+        Run `items` as part of the next batch(es) and return their results.
+        max_items caps the size of every batch they are put in.
+        """
+        items = list(items)
+        if not items:
+            return []
+        if not self.enabled or self._stopped:
+            return list(self.run_batch(items))
+
+        if max_items:
+            # a request over its own limit is queued as several chunks
+            limit = min(self.max_items, max(1, int(max_items)))
+            chunks = [items[i : i + limit] for i in range(0, len(items), limit)]
+        else:
+            limit, chunks = self.max_items, [items]
+        now = time.perf_counter()
+        futures = []
+        with self._cond:
+            self._ensure_worker()
+            for chunk in chunks:
+                future = Future()
+                self._queue.append((chunk, future, now, limit))
+                self._pending += len(chunk)
+                futures.append(future)
+            self._cond.notify()
+        return [r for future in futures for r in future.result()]
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._loop, name=f"batcher-{self.name}", daemon=True
+            )
+            self._worker.start()
+
+    # ─── WORKER SIDE ─────────────────────────────────────────────────────────
+    def _take_batch(self):
+        """Block for the first request, then gather more until full or timed out."""
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if self._stopped and not self._queue:
+                return None
+            deadline = self._queue[0][2] + self.max_wait
+            while self._pending < self._queue[0][3] and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size, limit = [], 0, self.max_items
+            # always take the first request, even if it alone exceeds max_items;
+            # the batch stays within the smallest limit of the requests in it
+            while self._queue:
+                items, _, _, cap = self._queue[0]
+                cap = min(limit, cap)
+                if batch and size + len(items) > cap:
+                    break
+                batch.append(self._queue.popleft())
+                size += len(items)
+                limit = cap
+            self._pending -= size
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            items = [item for entry, _, _, _ in batch for item in entry]
+            try:
+                results = list(self.run_batch(items))
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: {len(results)} results for {len(items)} inputs"
+                    )
+                pos = 0
+                for entry, future, _, _ in batch:
+                    future.set_result(results[pos : pos + len(entry)])
+                    pos += len(entry)
+            except Exception:
+                # retry one request at a time so one bad input fails only its caller
+                self._stats["errors"] += 1
+                for entry, future, _, _ in batch:
+                    try:
+                        future.set_result(list(self.run_batch(entry)))
+                    except Exception as e:
+                        future.set_exception(e)
+            run = time.perf_counter() - started
+
+            st = self._stats
+            st["batches"]        += 1
+            st["items"]          += len(items)
+            st["requests"]       += len(batch)
+            st["max_batch_size"]  = max(st["max_batch_size"], len(items))
+            st["wait_seconds"]   += sum(started - enqueued for _, _, enqueued, _ in batch)
+            st["run_seconds"]    += run
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            depth, waiting = self._pending, len(self._queue)
+        st = dict(self._stats)
+        batches, requests = st["batches"] or 1, st["requests"] or 1
+        return {
+            "enabled":          self.enabled,
+            "queue_depth":      depth,
+            "queued_requests":  waiting,
+            "batches":          st["batches"],
+            "items":            st["items"],
+            "requests":         st["requests"],
+            "errors":           st["errors"],
+            "avg_batch_size":   round(st["items"] / batches, 2),
+            "max_batch_size":   st["max_batch_size"],
+            "avg_wait_ms":      round(1000 * st["wait_seconds"] / requests, 2),
+            "avg_run_ms":       round(1000 * st["run_seconds"] / batches, 2),
+        }
+
+
+# ─── MODEL ADAPTERS ──────────────────────────────────────────────────────────
+def _run_qa(items):
+    qa = registry.get("distilbert-qa")
+    resp = qa(items, batch_size=min(len(items), INFER_BATCH_MAX_ITEMS))
+    # the pipeline unwraps single-item inputs into a bare dict
+    return [resp] if isinstance(resp, dict) else list(resp)
+
+
+def _run_embed(texts):
+    vecs = registry.get("minilm").encode(
+        texts,
+        batch_size=min(len(texts), max(INFER_BATCH_MAX_ITEMS, 64)),
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return list(np.asarray(vecs, dtype=np.float32))
+
+
+def _run_zero_shot(items):
+    """items: (text, candidate_labels) pairs; one pipeline call per label set."""
+    classifier = registry.get("bart-large-mnli")
+    groups = {}
+    for i, (text, labels) in enumerate(items):
+        groups.setdefault(tuple(labels), []).append(i)
+    results = [None] * len(items)
+    for labels, idxs in groups.items():
+        out = classifier([items[i][0] for i in idxs], list(labels))
+        out = [out] if isinstance(out, dict) else out
+        for i, res in zip(idxs, out):
+            results[i] = res
+    return results
+
+
+qa_batcher         = MicroBatcher("distilbert-qa", _run_qa)
+embed_batcher      = MicroBatcher("minilm", _run_embed)
+zero_shot_batcher  = MicroBatcher("bart-large-mnli", _run_zero_shot)
+BATCHERS = (qa_batcher, embed_batcher, zero_shot_batcher)
+
+
+def answer_questions(items, batch_size=None):
+    """QA results for {"question", "context"} dicts, in batches of at most batch_size."""
+    return qa_batcher.submit(items, max_items=batch_size)
+
+
+def embed(texts):
+    """Raw (unnormalized) MiniLM vectors, one row per text."""
+    rows = embed_batcher.submit(texts)
+    return np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+
+def classify(text, candidate_labels):
+    """Zero-shot result dict ({"labels", "scores"}) for one text."""
+    return zero_shot_batcher.submit([(text, list(candidate_labels))])[0]
+
+
+def scheduler_stats():
+    return {b.name: b.stats() for b in BATCHERS}
+
+
+def _stop_all():
+    for b in BATCHERS:
+        b.stop()
+
+
+registry.on_shutdown(_stop_all)
@@ -1,15 +1,14 @@
-import spacy
-from sklearn.feature_extraction.text import TfidfVectorizer
+from spacy_service import parse_many
+from term_stats import term_stats, terms_from_doc
 
-nlp = spacy.load("en_core_web_sm")
+def _key_phrases_from_doc(doc, top_n=10):
+    # idf comes from the corpus statistics, so nothing is fitted per document
+    return term_stats.top_terms(terms_from_doc(doc), top_n=top_n)
 
-def extract_key_phrases(text):
-    doc = nlp(text)
-    tokens = [token.text for token in doc if not token.is_stop and not token.is_punct]
-
-    tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform([' '.join(tokens)])
-    feature_names = tfidf.get_feature_names_out()
+def extract_key_phrases_many(texts, batch_size=None):
+    # stop-word / punctuation flags only need the tokenizer
+    docs = parse_many(texts, profile="tokens", batch_size=batch_size)
+    return [_key_phrases_from_doc(doc) for doc in docs]
 
-    key_phrases = [feature_names[i] for i in tfidf_matrix.sum(axis=0).argsort()[0, ::-1][:10]]
-    return key_phrases
+def extract_key_phrases(text):
+    return extract_key_phrases_many([text])[0]
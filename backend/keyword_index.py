@@ -0,0 +1,135 @@
+# backend/keyword_index.py
+"""
+One-pass multi-keyword matcher for the topic keyword file.
+
+Every keyword (and topic name) is tokenized into a tuple of word /
+punctuation tokens and stored in a single hash map. Matching tokenizes the
+text once and looks up the n-grams starting at each token, so all topic
+hits — overlapping ones included, e.g. "machine learning" and "learning" —
+come out of one scan instead of one regex per keyword.
+
+Indexes are built once per keyword-file version (path + mtime + size) and
+shared by TopicDetector and QuestionGenerator.
+"""
+import json
+import os
+import re
+import threading
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def tokenize(text):
+    return tuple(_TOKEN_RE.findall(text.lower()))
+
+
+class KeywordIndex:
+    def __init__(self, topic_keywords):
+        self.topic_keywords = topic_keywords
+        self.topics = list(topic_keywords)
+        # token tuple -> [(topic, keyword)], and token tuple -> [topic] for names
+        self._keywords = {}
+        self._names = {}
+        self._starts = set()
+        self.max_ngram = 1
+        for topic, keywords in topic_keywords.items():
+            self._add(self._names, tokenize(topic), topic)
+            for kw in set(keywords):
+                self._add(self._keywords, tokenize(kw), (topic, kw))
+
+    def _add(self, table, tokens, value):
+        if not tokens:
+            return
+        table.setdefault(tokens, []).append(value)
+        self._starts.add(tokens[0])
+        self.max_ngram = max(self.max_ngram, len(tokens))
+
+    def scan(self, text):
+        """
+        Returns ({topic: set(matched keywords)}, set(topics named in text))
+        from a single pass over the tokens of `text`.
+        """
+        tokens = tokenize(text)
+        hits, named = {}, set()
+        n_tokens = len(tokens)
+        starts = self._starts
+        for i in range(n_tokens):
+            if tokens[i] not in starts:
+                continue
+            for n in range(1, min(self.max_ngram, n_tokens - i) + 1):
+                gram = tokens[i : i + n]
+                for topic, kw in self._keywords.get(gram, ()):
+                    hits.setdefault(topic, set()).add(kw)
+                for topic in self._names.get(gram, ()):
+                    named.add(topic)
+        return hits, named
+
+    def first_topic(self, text):
+        """First topic, in keyword-file order, with any keyword in `text`."""
+        hits, _ = self.scan(text)
+        for topic in self.topics:
+            if topic in hits:
+                return topic
+        return None
+
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def get_keyword_index(path="topic_keywords_100plus_expanded.json"):
+    stamp = _file_stamp(path)
+    index = _indexes.get(stamp)
+    if index is not None:
+        return index
+    with _lock:
+        if stamp not in _indexes:
+            with open(path, "r") as f:
+                topic_keywords = json.load(f)
+            # drop indexes built from older versions of the same file
+            for old in [k for k in _indexes if k[0] == stamp[0]]:
+                del _indexes[old]
+            _indexes[stamp] = KeywordIndex(topic_keywords)
+        return _indexes[stamp]
+
+
+# ─── BENCHMARK ───────────────────────────────────────────────────────────────
+def _legacy_scan(topic_keywords, text):
+    """The per-keyword regex loop TopicDetector used before the index."""
+    text = text.lower()
+    hits = {}
+    for topic, keywords in topic_keywords.items():
+        matches = {k for k in set(keywords) if re.search(r'\b' + re.escape(k.lower()) + r'\b', text)}
+        if matches:
+            hits[topic] = matches
+    return hits
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    path   = "topic_keywords_100plus_expanded.json"
+    sample = sys.argv[1] if len(sys.argv) > 1 else "sample.txt"
+    with open(sample, "r") as f:
+        base = f.read()
+
+    index = get_keyword_index(path)
+    print(f"{sum(len(v) for v in index.topic_keywords.values())} keywords, "
+          f"{len(index.topics)} topics, longest keyword {index.max_ngram} tokens")
+    for repeat in (1, 10, 50):
+        text = "\n".join([base] * repeat)
+        t0 = time.perf_counter()
+        legacy = _legacy_scan(index.topic_keywords, text)
+        t1 = time.perf_counter()
+        hits, _ = index.scan(text)
+        t2 = time.perf_counter()
+        same = sum(1 for t in set(legacy) | set(hits) if legacy.get(t) == hits.get(t))
+        print(f"{len(text):>9} chars | regex loop {t1 - t0:8.3f}s | index {t2 - t1:8.3f}s "
+              f"| {(t1 - t0) / max(t2 - t1, 1e-9):6.1f}x | "
+              f"identical topics {same}/{len(set(legacy) | set(hits))}")
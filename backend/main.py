@@ -1,13 +1,21 @@
 
+import argparse
 import logging
-from question_generation import QuestionGenerator
-from topic_detection import TopicDetector
+from model_registry import get_question_generator, get_topic_detector
+from question_generation import DECODING_PROFILES, decoding_stats
 
 logging.basicConfig(level=logging.INFO)
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a quiz from sample.txt")
+    parser.add_argument(
+        "--decoding", choices=sorted(DECODING_PROFILES), default=None,
+        help="flan-t5 decoding profile (default: DECODING_PROFILE env or 'fast')"
+    )
+    args = parser.parse_args(argv)
+
     try:
-        detector = TopicDetector("topic_keywords_100plus_expanded.json")
+        detector = get_topic_detector("topic_keywords_100plus_expanded.json")
 
         filepath = "sample.txt"
         detected_topic, content = detector.detect_topic_from_file(filepath)
@@ -15,14 +23,15 @@ def main():
         logging.info(f"Detected Topic: {detected_topic}")
         logging.info(f"Content preview: {content[:200]}...")
 
-        question_generator = QuestionGenerator(
+        question_generator = get_question_generator(
             "question_templates_expanded.json",
             use_neural=True
         )
         questions = question_generator.generate_questions(
             detected_topic,
             content,
-            num_questions=10
+            num_questions=10,
+            decoding=args.decoding
         )
 
         for idx, q in enumerate(questions, start=1):
@@ -38,6 +47,11 @@ def main():
             else:
                 print(f"{idx}. [Unknown] {q}\n")
 
+        for name, st in decoding_stats().items():
+            if st["calls"]:
+                logging.info(f"Decoding '{name}': {st['tokens']} tokens in "
+                             f"{st['seconds']}s ({st['tokens_per_sec']} tokens/sec)")
+
     except Exception as e:
         logging.error(f"Error occurred: {e}")
 
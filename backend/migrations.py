@@ -0,0 +1,400 @@
+# backend/migrations.py
+"""
+Versioned schema migrations for quizzes.db.
+
+Each migration runs once, in order, inside its own write transaction and is
+recorded in the `schema_version` table. Version 1 is the baseline: it
+creates the core tables for a new database and, for an existing one, adds
+whatever columns the older ad-hoc CREATE TABLEs left out.
+
+    python migrations.py            apply pending migrations
+    python migrations.py status     applied and pending versions
+    python migrations.py check      EXPLAIN QUERY PLAN for the hot queries;
+                                    exits 1 if one of them scans a table
+
+Every table in quizzes.db is created here, including the ones a single
+module owns (generation_jobs, template_stats, term_df, uploads); those
+modules only call migrate() before first use. The disposable NLP result
+cache lives in its own nlp_cache.db and is not versioned.
+"""
+import json
+import sys
+import threading
+
+from answer_key import question_rows
+from db import DB_PATH, connection, transaction
+import queries
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_columns(conn, table, columns):
+    """ALTER TABLE ADD COLUMN for each (name, decl) the table does not have yet."""
+    have = _columns(conn, table)
+    for name, decl in columns:
+        if name not in have:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+# ─── MIGRATIONS ──────────────────────────────────────────────────────────────
+def _v1_baseline(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quizzes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_by TEXT DEFAULT 'admin',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            code TEXT,
+            active INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    _add_columns(conn, "quizzes", [
+        ("code",   "TEXT"),
+        ("active", "INTEGER NOT NULL DEFAULT 1"),
+    ])
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quiz_id INTEGER,
+            student_id TEXT,
+            status TEXT DEFAULT 'assigned',
+            assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            due_at TEXT,
+            score INTEGER DEFAULT 0,
+            submitted_at TIMESTAMP,
+            time_limit INTEGER,
+            answers TEXT
+        )
+    """)
+    _add_columns(conn, "assignments", [
+        ("due_at",       "TEXT"),
+        ("score",        "INTEGER DEFAULT 0"),
+        ("submitted_at", "TIMESTAMP"),
+        ("time_limit",   "INTEGER"),
+        ("answers",      "TEXT"),
+    ])
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            name TEXT,
+            surname TEXT,
+            email TEXT,
+            class_id TEXT,  -- nullable, no DEFAULT
+            role TEXT DEFAULT 'student',
+            password TEXT
+        )
+    """)
+    _add_columns(conn, "students", [
+        ("name",     "TEXT"),
+        ("surname",  "TEXT"),
+        ("email",    "TEXT"),
+        ("class_id", "TEXT"),
+        ("role",     "TEXT DEFAULT 'student'"),
+        ("password", "TEXT"),
+    ])
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS classes (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            teacher_id TEXT
+        )
+    """)
+    _add_columns(conn, "classes", [("teacher_id", "TEXT")])
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS teachers (
+            teacher_id TEXT PRIMARY KEY,
+            name       TEXT,
+            surname    TEXT,
+            email      TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            password   TEXT
+        )
+    """)
+    _add_columns(conn, "teachers", [("password", "TEXT")])
+
+
+def _v2_split_teachers(conn):
+    """Move role='teacher' rows out of `students` into `teachers`."""
+    conn.execute("""
+        INSERT OR IGNORE INTO teachers (teacher_id, name, surname, email, password)
+          SELECT student_id, name, surname, email, password
+          FROM students
+          WHERE role = 'teacher'
+    """)
+    conn.execute("DELETE FROM students WHERE role = 'teacher'")
+
+
+def _v3_hot_path_indexes(conn):
+    # idx_quizzes_code may already exist as a UNIQUE index on older databases
+    for name, target in [
+        ("idx_assignments_student_assigned", "assignments(student_id, assigned_at)"),
+        ("idx_assignments_quiz",             "assignments(quiz_id)"),
+        ("idx_students_class",               "students(class_id)"),
+        ("idx_quizzes_code",                 "quizzes(code)"),
+        ("idx_quizzes_active_created",       "quizzes(active, created_at)"),
+    ]:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    conn.execute("ANALYZE")
+
+
+def _v4_questions_table(conn):
+    """One typed row per question, backfilled from quizzes.data."""
+    _add_columns(conn, "quizzes", [("version", "INTEGER NOT NULL DEFAULT 1")])
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            quiz_id     INTEGER NOT NULL,
+            position    INTEGER NOT NULL,
+            kind        TEXT NOT NULL,
+            question    TEXT NOT NULL,
+            answer      TEXT,
+            answer_norm TEXT NOT NULL,
+            options     TEXT,
+            PRIMARY KEY (quiz_id, position)
+        ) WITHOUT ROWID
+    """)
+    for quiz_id, data in conn.execute("SELECT id, data FROM quizzes").fetchall():
+        try:
+            qa_pairs = json.loads(data)
+        except (TypeError, ValueError):
+            print(f"[WARN] Quiz {quiz_id} has malformed question data; not backfilled")
+            continue
+        conn.executemany(
+            "INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            question_rows(quiz_id, qa_pairs)
+        )
+
+
+def _v5_grading_settings(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS grading_settings (
+            quiz_id            INTEGER PRIMARY KEY,
+            mode               TEXT NOT NULL,
+            overlap_threshold  REAL NOT NULL,
+            semantic_threshold REAL NOT NULL,
+            updated_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _v6_generation_jobs(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id               TEXT PRIMARY KEY,
+            status           TEXT NOT NULL DEFAULT 'queued',
+            params           TEXT NOT NULL,
+            progress         REAL NOT NULL DEFAULT 0,
+            partial          TEXT,
+            result           TEXT,
+            error            TEXT,
+            timings          TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at       TIMESTAMP,
+            finished_at      TIMESTAMP,
+            owner            TEXT,
+            heartbeat_at     REAL
+        )
+    """)
+    # tables created by generation_jobs.py before job ownership existed
+    _add_columns(conn, "generation_jobs", [
+        ("owner",        "TEXT"),
+        ("heartbeat_at", "REAL"),
+    ])
+
+
+def _v7_template_stats(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS template_stats (
+            template   TEXT PRIMARY KEY,
+            attempts   INTEGER NOT NULL DEFAULT 0,
+            accepted   INTEGER NOT NULL DEFAULT 0,
+            low_score  INTEGER NOT NULL DEFAULT 0,
+            empty      INTEGER NOT NULL DEFAULT 0,
+            duplicate  INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _v8_term_stats(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS term_df (
+            feature INTEGER PRIMARY KEY,
+            df      INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS term_docs (
+            doc_hash TEXT PRIMARY KEY,
+            n_terms  INTEGER NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _v9_uploads(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS uploads (
+            sha256          TEXT PRIMARY KEY,
+            ext             TEXT NOT NULL,
+            size            INTEGER NOT NULL,
+            original_name   TEXT,
+            page_count      INTEGER,
+            text            TEXT,
+            page_offsets    TEXT,
+            truncated       INTEGER NOT NULL DEFAULT 0,
+            extract_seconds REAL,
+            hits            INTEGER NOT NULL DEFAULT 0,
+            created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at    REAL
+        )
+    """)
+
+
+MIGRATIONS = [
+    (1, "baseline core tables",              _v1_baseline),
+    (2, "move teacher rows into teachers",   _v2_split_teachers),
+    (3, "hot-path secondary indexes",        _v3_hot_path_indexes),
+    (4, "normalized questions table",        _v4_questions_table),
+    (5, "per-quiz grading settings",         _v5_grading_settings),
+    (6, "generation job queue",              _v6_generation_jobs),
+    (7, "template yield statistics",         _v7_template_stats),
+    (8, "corpus term frequencies",           _v8_term_stats),
+    (9, "content-addressed upload store",    _v9_uploads),
+]
+
+
+# ─── RUNNER ──────────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+_migrated = set()
+
+
+def _ensure_version_table(db_path):
+    with transaction(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version     INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+
+def current_version(db_path=None):
+    _ensure_version_table(db_path)
+    with connection(db_path) as conn:
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(db_path=None):
+    """Apply pending migrations; returns the versions applied by this call."""
+    db_path = db_path or DB_PATH
+    with _lock:
+        if db_path in _migrated:
+            return []
+        _ensure_version_table(db_path)
+        applied = []
+        for version, description, step in MIGRATIONS:
+            # BEGIN IMMEDIATE: a second process blocks here instead of racing us
+            with transaction(db_path, immediate=True) as conn:
+                done = conn.execute(
+                    "SELECT 1 FROM schema_version WHERE version = ?", (version,)
+                ).fetchone()
+                if done:
+                    continue
+                step(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+            print(f"[INFO] Applied schema migration {version}: {description}")
+            applied.append(version)
+        _migrated.add(db_path)
+        return applied
+
+
+def status(db_path=None):
+    _ensure_version_table(db_path)
+    with connection(db_path) as conn:
+        done = {r["version"]: r["applied_at"] for r in conn.execute(
+            "SELECT version, applied_at FROM schema_version"
+        )}
+    return [
+        {"version": v, "description": d, "applied_at": done.get(v)}
+        for v, d, _ in MIGRATIONS
+    ]
+
+
+# ─── QUERY PLAN CHECKS ───────────────────────────────────────────────────────
+# The per-request queries that must stay on an index as the tables grow,
+# taken from queries.py so the check sees the statements the routes run:
+# name -> (sql, sample params, indexes the plan has to mention)
+HOT_QUERIES = {
+    "student_quizzes":     (queries.STUDENT_QUIZZES, ("s1",),
+                            ["idx_assignments_student_assigned"]),
+    "class_performance":   (queries.CLASS_PERFORMANCE, ("c1",),
+                            ["idx_students_class", "idx_assignments_student_assigned"]),
+    "class_students":      (queries.CLASS_STUDENTS, ("c1",), ["idx_students_class"]),
+    "class_roster":        (queries.CLASS_ROSTER, ("c1",), ["idx_students_class"]),
+    "join_quiz_by_code":   (queries.QUIZ_BY_CODE, ("ABC123",), ["idx_quizzes_code"]),
+    "list_active_quizzes": (queries.QUIZZES_BY_ACTIVE, (1,), ["idx_quizzes_active_created"]),
+    "quiz_assignees":      (queries.QUIZ_ASSIGNEES, (1,), ["idx_assignments_quiz"]),
+}
+
+
+def explain(sql, params=(), db_path=None):
+    with connection(db_path) as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query_plans(db_path=None):
+    """
+    One entry per HOT_QUERIES item with its plan and any problems: a full
+    table scan, a temp B-tree sort, or an expected index that is not used.
+    """
+    migrate(db_path)
+    report = []
+    for name, (sql, params, indexes) in HOT_QUERIES.items():
+        plan = explain(sql, params, db_path)
+        problems = [
+            step for step in plan
+            if (step.startswith("SCAN ") and " INDEX " not in step)
+            or "TEMP B-TREE" in step
+        ]
+        problems += [
+            f"{index} not used" for index in indexes
+            if not any(index in step for step in plan)
+        ]
+        report.append({"query": name, "plan": plan, "ok": not problems, "problems": problems})
+    return report
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if cmd == "migrate":
+        print(f"applied: {migrate() or 'nothing'}; schema version {current_version()}")
+    elif cmd == "status":
+        for row in status():
+            print(f"{row['version']:>3}  {row['applied_at'] or 'pending':<20}  {row['description']}")
+    elif cmd == "check":
+        failed = 0
+        for r in check_query_plans():
+            print(f"{'ok  ' if r['ok'] else 'FAIL'}  {r['query']}")
+            for step in r["plan"]:
+                print(f"        {step}")
+            for p in r["problems"]:
+                print(f"        !! {p}")
+            failed += not r["ok"]
+        sys.exit(1 if failed else 0)
+    else:
+        print("usage: python migrations.py [migrate|status|check]")
@@ -0,0 +1,270 @@
+# backend/model_registry.py
+"""
+Process-wide registry for the NLP checkpoints used by the backend.
+
+Every checkpoint is loaded at most once per process, no matter how many
+request threads ask for it at the same time. `QuestionGenerator` and
+`TopicDetector` instances are shared the same way, so `app.py`,
+`quiz_routes.py` and `main.py` all talk to one set of models.
+
+Nothing is loaded at import time: models are loaded on first use, or ahead
+of time by `registry.warmup()` in a background thread.
+"""
+import atexit
+import os
+import threading
+import time
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaders = {}
+        self._load_locks = {}
+        self._models = {}
+        self._load_times = {}
+        self._errors = {}
+        self._loading = set()
+        self._shutdown_hooks = []
+        self._warmup_hooks = []
+        self._warmup_thread = None
+
+    # ─── REGISTRATION ────────────────────────────────────────────────────────
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def names(self):
+        with self._lock:
+            return list(self._loaders)
+
+    # ─── ACCESS ──────────────────────────────────────────────────────────────
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"Unknown model: {name}")
+            load_lock = self._load_locks[name]
+            loader    = self._loaders[name]
+
+        # double-checked: only one thread loads, the others wait and reuse it
+        with load_lock:
+            if name not in self._models:
+                print(f"[INFO] Loading model '{name}'")
+                self._loading.add(name)
+                start = time.perf_counter()
+                try:
+                    model = loader()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                finally:
+                    self._loading.discard(name)
+                self._errors.pop(name, None)
+                self._load_times[name] = round(time.perf_counter() - start, 3)
+                self._models[name] = model
+            return self._models[name]
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def state(self, name):
+        if name in self._models:
+            return "loaded"
+        if name in self._loading:
+            return "loading"
+        if name in self._errors:
+            return "error"
+        return "pending"
+
+    def status(self):
+        out = {}
+        for name in self.names():
+            out[name] = {
+                "state":        self.state(name),
+                "loaded":       name in self._models,
+                "load_seconds": self._load_times.get(name),
+                "error":        self._errors.get(name),
+            }
+        return out
+
+    # ─── LIFECYCLE ───────────────────────────────────────────────────────────
+    def warmup(self, names=None, background=True):
+        """
+        Load `names` (default: every registered model, in registration
+        order). With background=True this returns immediately and the
+        models are loaded one by one in a daemon thread.
+        """
+        names = list(names) if names else self.names()
+
+        def _run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"[WARN] Warmup of '{name}' failed: {e}")
+            for hook in self._warmup_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    print(f"[WARN] Warmup hook failed: {e}")
+
+        if not background:
+            _run()
+            return None
+        with self._lock:
+            if self._warmup_thread is None or not self._warmup_thread.is_alive():
+                self._warmup_thread = threading.Thread(
+                    target=_run, name="model-warmup", daemon=True
+                )
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    def after_warmup(self, hook):
+        """Run `hook` once warmup has loaded its models, e.g. to build indexes."""
+        self._warmup_hooks.append(hook)
+
+    def is_warming(self):
+        return self._warmup_thread is not None and self._warmup_thread.is_alive()
+
+    def on_shutdown(self, hook):
+        self._shutdown_hooks.append(hook)
+
+    def unload(self, name):
+        with self._lock:
+            load_lock = self._load_locks.get(name)
+        if load_lock is None:
+            return False
+        with load_lock:
+            self._load_times.pop(name, None)
+            return self._models.pop(name, None) is not None
+
+    def shutdown(self):
+        for hook in reversed(self._shutdown_hooks):
+            try:
+                hook()
+            except Exception as e:
+                print(f"[WARN] Shutdown hook failed: {e}")
+        for name in self.names():
+            self.unload(name)
+
+    def init_app(self, app):
+        app.extensions["model_registry"] = self
+
+
+registry = ModelRegistry()
+atexit.register(registry.shutdown)
+
+
+# default summarization model: "bart-large-cnn" (what /api/summarize has
+# always used) or "flan-t5-base" (shared with question generation)
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", "bart-large-cnn")
+if SUMMARY_MODEL not in ("flan-t5-base", "bart-large-cnn"):
+    raise ValueError(f"Unknown SUMMARY_MODEL '{SUMMARY_MODEL}'")
+
+
+# ─── CHECKPOINT LOADERS ──────────────────────────────────────────────────────
+def _device_index():
+    import torch
+    return 0 if torch.cuda.is_available() else -1
+
+
+def _load_spacy_sm():
+    import spacy
+    return spacy.load("en_core_web_sm")
+
+
+def _load_distilbert_qa():
+    from transformers import pipeline
+    from inference_backend import load_qa_model, pipeline_device
+    tokenizer, model = load_qa_model()
+    return pipeline(
+        "question-answering",
+        model=model,
+        tokenizer=tokenizer,
+        device=pipeline_device(model)
+    )
+
+
+def _load_flan_t5():
+    # eager / int8-quantized PyTorch or ONNX Runtime, per INFERENCE_BACKEND
+    from inference_backend import load_seq2seq_model, FLAN_MODEL_ID
+    return load_seq2seq_model(FLAN_MODEL_ID)
+
+
+def _load_bart_mnli():
+    from transformers import pipeline
+    return pipeline(
+        "zero-shot-classification",
+        model="facebook/bart-large-mnli",
+        device=_device_index()
+    )
+
+
+def _load_minilm():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+
+def _load_bart_cnn():
+    from inference_backend import load_seq2seq_model, BART_CNN_MODEL_ID
+    return load_seq2seq_model(BART_CNN_MODEL_ID)
+
+
+# registration order is also the warmup order: cheap, hot models first
+registry.register("en_core_web_sm",     _load_spacy_sm)
+registry.register("distilbert-qa",      _load_distilbert_qa)
+registry.register("minilm",             _load_minilm)
+registry.register("flan-t5-base",       _load_flan_t5)
+registry.register("bart-large-mnli",    _load_bart_mnli)
+# bart-large-cnn is only registered (and warmed up) when it is the default
+# summarizer; with SUMMARY_MODEL=flan-t5-base no extra model is resident
+if SUMMARY_MODEL == "bart-large-cnn":
+    registry.register("bart-large-cnn", _load_bart_cnn)
+
+
+# ─── SHARED SERVICES ─────────────────────────────────────────────────────────
+_services_lock = threading.Lock()
+_generators    = {}
+_detectors     = {}
+
+
+def get_question_generator(expanded_path="question_templates_expanded.json",
+                           updated_path="question_templates_updated.json",
+                           use_neural=True):
+    key = (expanded_path, updated_path, use_neural)
+    qg = _generators.get(key)
+    if qg is not None:
+        return qg
+    with _services_lock:
+        if key not in _generators:
+            from question_generation import QuestionGenerator
+            _generators[key] = QuestionGenerator(
+                expanded_path, updated_path, use_neural=use_neural
+            )
+        return _generators[key]
+
+
+def get_topic_detector(topic_file="topic_keywords_100plus_expanded.json"):
+    topic_file = os.path.abspath(topic_file)
+    detector = _detectors.get(topic_file)
+    if detector is not None:
+        return detector
+    with _services_lock:
+        if topic_file not in _detectors:
+            from topic_detection import TopicDetector
+            _detectors[topic_file] = TopicDetector(topic_file)
+        return _detectors[topic_file]
+
+
+def _clear_services():
+    with _services_lock:
+        _generators.clear()
+        _detectors.clear()
+
+
+registry.on_shutdown(_clear_services)
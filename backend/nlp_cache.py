@@ -0,0 +1,244 @@
+# backend/nlp_cache.py
+"""
+Content-hash memoization for the NLP endpoints.
+
+Results are keyed by a hash of the normalized input text plus the operation
+parameters (topic, counts, method, model id, template-set version, ...).
+Two tiers: a size-bounded in-memory LRU, backed by a SQLite table with a
+TTL and row-count eviction. Values are stored as JSON, so a hit from
+either tier returns the same shape.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from db import connection, transaction
+
+CACHE_DB_PATH      = os.environ.get("NLP_CACHE_DB", "nlp_cache.db")
+MEMORY_MAX_ITEMS   = int(os.environ.get("NLP_CACHE_MEMORY_ITEMS", "512"))
+MEMORY_MAX_BYTES   = int(os.environ.get("NLP_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+DISK_TTL_SECONDS   = int(os.environ.get("NLP_CACHE_TTL", str(7 * 24 * 3600)))
+DISK_MAX_ROWS      = int(os.environ.get("NLP_CACHE_MAX_ROWS", "20000"))
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def file_version(*paths):
+    """Short content hash of one or more files, e.g. a template set."""
+    h = hashlib.sha1()
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        except OSError:
+            h.update(path.encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def make_key(op, text, **params):
+    raw = json.dumps(
+        {"op": op, "text": text_hash(text), "params": params},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class NLPCache:
+    def __init__(self, db_path=CACHE_DB_PATH,
+                 max_items=MEMORY_MAX_ITEMS,
+                 max_bytes=MEMORY_MAX_BYTES,
+                 ttl=DISK_TTL_SECONDS,
+                 max_rows=DISK_MAX_ROWS):
+        self.db_path   = db_path
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self.max_rows  = max_rows
+
+        self._lock   = threading.Lock()
+        self._memory = OrderedDict()
+        self._bytes  = 0
+        self._stats  = {}
+        self._db_ready = False
+
+    # ─── SQLITE TIER ─────────────────────────────────────────────────────────
+    def _ensure_table(self):
+        if self._db_ready:
+            return
+        with transaction(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS nlp_cache (
+                    key         TEXT PRIMARY KEY,
+                    op          TEXT NOT NULL,
+                    value       TEXT NOT NULL,
+                    size        INTEGER NOT NULL,
+                    created_at  REAL NOT NULL,
+                    expires_at  REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_nlp_cache_last_access ON nlp_cache(last_access)"
+            )
+        self._db_ready = True
+
+    def _disk_get(self, key):
+        now = time.time()
+        self._ensure_table()
+        with transaction(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM nlp_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] < now:
+                conn.execute("DELETE FROM nlp_cache WHERE key = ?", (key,))
+                row = None
+            elif row:
+                conn.execute("UPDATE nlp_cache SET last_access = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+
+    def _disk_put(self, key, op, value):
+        now = time.time()
+        self._ensure_table()
+        with transaction(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO nlp_cache "
+                "(key, op, value, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, op, value, len(value), now, now + self.ttl, now)
+            )
+        with transaction(self.db_path) as conn:
+            self._evict_disk(conn, now)
+
+    def _evict_disk(self, conn, now):
+        conn.execute("DELETE FROM nlp_cache WHERE expires_at < ?", (now,))
+        rows = conn.execute("SELECT COUNT(*) FROM nlp_cache").fetchone()[0]
+        if rows > self.max_rows:
+            conn.execute(
+                "DELETE FROM nlp_cache WHERE key IN ("
+                "  SELECT key FROM nlp_cache ORDER BY last_access LIMIT ?)",
+                (rows - self.max_rows,)
+            )
+
+    # ─── MEMORY TIER ─────────────────────────────────────────────────────────
+    def _memory_put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._memory[key] = value
+            self._bytes += size
+            while self._memory and (
+                len(self._memory) > self.max_items or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._memory.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _count(self, op, field):
+        with self._lock:
+            stats = self._stats.setdefault(
+                op, {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+            )
+            stats[field] += 1
+
+    # ─── PUBLIC API ──────────────────────────────────────────────────────────
+    def get(self, op, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+        if value is not None:
+            self._count(op, "memory_hits")
+            return json.loads(value)
+
+        try:
+            value = self._disk_get(key)
+        except sqlite3.Error as e:
+            print(f"[WARN] NLP cache read failed: {e}")
+            value = None
+        if value is not None:
+            self._count(op, "disk_hits")
+            self._memory_put(key, value)
+            return json.loads(value)
+
+        self._count(op, "misses")
+        return None
+
+    def put(self, op, key, result):
+        value = json.dumps(result)
+        self._memory_put(key, value)
+        try:
+            self._disk_put(key, op, value)
+        except sqlite3.Error as e:
+            print(f"[WARN] NLP cache write failed: {e}")
+
+    def memoize(self, op, text, compute, refresh=False, **params):
+        """
+        Return the cached result for (op, text, params) or compute and store
+        it. refresh=True skips the lookup but still stores the new result.
+        """
+        key = make_key(op, text, **params)
+        if not refresh:
+            hit = self.get(op, key)
+            if hit is not None:
+                return hit
+        else:
+            self._count(op, "misses")
+        result = compute()
+        self.put(op, key, result)
+        # hand back the same JSON shape a later cache hit would
+        return json.loads(json.dumps(result))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+        self._ensure_table()
+        with transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM nlp_cache")
+
+    def stats(self):
+        with self._lock:
+            ops = {op: dict(s) for op, s in self._stats.items()}
+            memory = {
+                "items":     len(self._memory),
+                "bytes":     self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+            }
+        totals = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        for s in ops.values():
+            for k in totals:
+                totals[k] += s[k]
+        lookups = sum(totals.values())
+        totals["hit_rate"] = round(
+            (totals["memory_hits"] + totals["disk_hits"]) / lookups, 4
+        ) if lookups else 0.0
+
+        try:
+            self._ensure_table()
+            with connection(self.db_path) as conn:
+                rows, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM nlp_cache"
+                ).fetchone()
+            disk = {"rows": rows, "bytes": size, "max_rows": self.max_rows, "ttl": self.ttl}
+        except sqlite3.Error as e:
+            disk = {"error": str(e)}
+
+        return {"totals": totals, "operations": ops, "memory": memory, "disk": disk}
+
+
+cache = NLPCache()
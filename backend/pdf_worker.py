@@ -0,0 +1,12 @@
+# backend/pdf_worker.py
+"""
+Process-pool task for PDF text extraction. Kept apart from upload_handler
+so that spawned workers only import PyMuPDF, not Flask or the NLP stack.
+"""
+import fitz  # PyMuPDF
+
+
+def pdf_pages_text(path, page_numbers):
+    """Text of each of the given pages of the PDF at `path`."""
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in page_numbers]
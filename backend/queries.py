@@ -0,0 +1,46 @@
+# backend/queries.py
+"""
+SQL for the per-request hot paths, shared by the routes that run it and by
+`migrations.HOT_QUERIES`, so `python migrations.py check` explains exactly
+the statements the app executes.
+"""
+
+# a student's quizzes, newest assignment first
+STUDENT_QUIZZES = """
+    SELECT
+      q.id           AS quiz_id,
+      q.title        AS title,
+      q.topic        AS topic,
+      a.assigned_at  AS assigned_at,
+      a.due_at       AS due_at,
+      a.status       AS status,
+      a.score        AS score,
+      a.submitted_at AS submitted_at,
+      a.time_limit   AS time_limit,
+      a.id           AS assignment_id
+    FROM quizzes q
+    JOIN assignments a ON a.quiz_id = q.id
+    WHERE a.student_id = ?
+    ORDER BY a.assigned_at DESC
+"""
+
+# every assignment held by the students of a class
+CLASS_PERFORMANCE = """
+    SELECT a.status, a.due_at, a.submitted_at
+    FROM assignments a
+    JOIN students s ON s.student_id = a.student_id
+    WHERE s.class_id = ?
+"""
+
+CLASS_STUDENTS = "SELECT student_id, name, surname, email, class_id FROM students WHERE class_id = ?"
+
+CLASS_ROSTER = "SELECT student_id FROM students WHERE class_id = ?"
+
+QUIZ_BY_CODE = "SELECT id FROM quizzes WHERE code = ?"
+
+QUIZZES_BY_ACTIVE = (
+    "SELECT id, title, topic, data, code, created_at, active FROM quizzes "
+    "WHERE active = ? ORDER BY created_at DESC"
+)
+
+QUIZ_ASSIGNEES = "SELECT student_id FROM assignments WHERE quiz_id = ?"
@@ -1,24 +1,113 @@
 import json
+import math
+import os
 import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import torch
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 from answer_postprocessor import clean_answer
-from key_phrase_extraction import extract_key_phrases
-import spacy
-
-_NLP = spacy.load("en_core_web_sm")
-
-with open("topic_keywords_100plus_expanded.json", "r") as f:
-    TOPIC_KEYWORDS = json.load(f)
+from key_phrase_extraction import extract_key_phrases_many
+from model_registry import registry
+from nlp_cache import file_version
+from summarizer import summarize_text
+from keyword_index import get_keyword_index
+from distractor_index import get_distractor_index
+from term_stats import term_stats
+from template_stats import template_stats
+from inference_scheduler import qa_batcher, answer_questions
+
+TOPIC_FILE = "topic_keywords_100plus_expanded.json"
+
+# number of question/context pairs sent through distilbert per forward pass
+QA_BATCH_SIZE = int(os.environ.get("QA_BATCH_SIZE", "16"))
+
+# map-reduce neural generation: token-bounded, overlapping windows of the
+# source text are prompted separately and their questions merged
+NEURAL_WINDOW_TOKENS  = int(os.environ.get("NEURAL_WINDOW_TOKENS", "448"))
+NEURAL_WINDOW_OVERLAP = int(os.environ.get("NEURAL_WINDOW_OVERLAP", "64"))
+NEURAL_MAX_WINDOWS    = int(os.environ.get("NEURAL_MAX_WINDOWS", "32"))
+# windows prompted beyond what the shortfall needs, in case some yield nothing
+NEURAL_SPARE_WINDOWS  = int(os.environ.get("NEURAL_SPARE_WINDOWS", "1"))
+NEURAL_BATCH_SIZE     = int(os.environ.get("NEURAL_BATCH_SIZE", "4"))
+NEURAL_WORKERS        = int(os.environ.get("NEURAL_WORKERS", "1"))
+
+# flan-t5 decoding profiles, from cheapest to best. None of them sample, so
+# no temperature is passed. DECODING_PROFILE picks the deployment default
+# (greedy, since the neural pass only tops up what templates missed);
+# requests may name another one.
+DECODING_PROFILES = {
+    "fast":     {"num_beams": 1, "max_new_tokens": 192},
+    "balanced": {"num_beams": 2, "max_new_tokens": 320, "early_stopping": True},
+    "quality":  {"num_beams": 4, "max_new_tokens": 512, "early_stopping": True},
+}
+DECODING_PROFILE = os.environ.get("DECODING_PROFILE", "fast")
+
+_decoding_lock  = threading.Lock()
+_decoding_stats = {}
+
+
+def resolve_decoding(profile=None):
+    """Profile name to use, raising ValueError for unknown names."""
+    profile = profile or DECODING_PROFILE
+    if profile not in DECODING_PROFILES:
+        raise ValueError(
+            f"Unknown decoding profile '{profile}', expected one of {sorted(DECODING_PROFILES)}"
+        )
+    return profile
+
+
+def resolve_batch_size(value=None):
+    """QA batch size from a request, None if not given; ValueError unless a positive int."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError("batch_size must be a positive integer")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("batch_size must be a positive integer")
+    if value < 1:
+        raise ValueError("batch_size must be a positive integer")
+    return value
+
+
+def _record_decoding(profile, n_prompts, n_tokens, seconds):
+    with _decoding_lock:
+        st = _decoding_stats.setdefault(
+            profile, {"calls": 0, "prompts": 0, "tokens": 0, "seconds": 0.0}
+        )
+        st["calls"]   += 1
+        st["prompts"] += n_prompts
+        st["tokens"]  += n_tokens
+        st["seconds"] += seconds
+
+
+def decoding_stats():
+    """Generated tokens and throughput per decoding profile since startup."""
+    with _decoding_lock:
+        out = {}
+        for name, settings in DECODING_PROFILES.items():
+            st = dict(_decoding_stats.get(
+                name, {"calls": 0, "prompts": 0, "tokens": 0, "seconds": 0.0}
+            ))
+            st["seconds"] = round(st["seconds"], 3)
+            st["tokens_per_sec"] = round(st["tokens"] / st["seconds"], 1) if st["seconds"] else None
+            out[name] = {"settings": settings, "default": name == DECODING_PROFILE, **st}
+        return out
 
 class QuestionGenerator:
+    QA_MODEL_ID   = "distilbert-base-cased-distilled-squad"
+    FLAN_MODEL_ID = "google/flan-t5-base"
+
     def __init__(self,
                  expanded_path="question_templates_expanded.json",
                  updated_path="question_templates_updated.json",
-                 use_neural=True):
+                 use_neural=True,
+                 qa_batch_size=QA_BATCH_SIZE):
         try:
             with open(expanded_path, "r") as f:
                 raw_exp = json.load(f)
@@ -35,33 +124,39 @@ class QuestionGenerator:
             print(f"[WARN] Could not load {updated_path}: {e}")
             self.templates_updated = []
 
-        self.qa_model = pipeline(
-            "question-answering",
-            model="distilbert-base-cased-distilled-squad"
-        )
+        # changes whenever a template file changes, invalidating cached output
+        self.template_version = file_version(expanded_path, updated_path)
 
         self.use_neural = use_neural
+        self.qa_batch_size = max(1, int(qa_batch_size))
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        if self.use_neural:
-            self.flan_tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-base")
-            self.flan_model = AutoModelForSeq2SeqLM.from_pretrained(
-                "google/flan-t5-base"
-            ).to(self.device)
-
-        self.summarizer = pipeline(
-            "summarization",
-            model="google/flan-t5-base",
-            device=0 if torch.cuda.is_available() else -1
-        )
+
+    # checkpoints are shared process-wide and loaded on first use
+    @property
+    def qa_model(self):
+        return registry.get("distilbert-qa")
+
+    @property
+    def flan_tokenizer(self):
+        return registry.get("flan-t5-base")[0]
+
+    @property
+    def flan_model(self):
+        return registry.get("flan-t5-base")[1]
+
+    def cache_params(self, decoding=None):
+        """Everything besides the input text that determines generator output."""
+        return {
+            "templates":  self.template_version,
+            "models":     [self.QA_MODEL_ID, self.FLAN_MODEL_ID],
+            "use_neural": self.use_neural,
+            "decoding":   resolve_decoding(decoding),
+        }
 
     def summarize(self, text: str, max_length: int = 150, min_length: int = 50) -> str:
-        result = self.summarizer(
-            text,
-            max_length=max_length,
-            min_length=min_length,
-            do_sample=False
-        )
-        return result[0]["summary_text"]
+        # the shared hierarchical service, so long texts are summarized in full
+        return summarize_text(text, max_length=max_length, min_length=min_length)
+
     def _default_templates(self):
         return [
             "What is {}?",
@@ -71,190 +166,306 @@ class QuestionGenerator:
             "What challenges arise when using {}?"
         ]
 
-    def _generate_candidate_distractors(self, question: str) -> list[str]:
-        doc = _NLP(question)
-        chunks = [chunk.text.strip() for chunk in doc.noun_chunks]
-        single_nouns = [
-            tok.text.strip()
-            for tok in doc
-            if tok.pos_ in ("NOUN", "PROPN") and tok.is_alpha and len(tok.text) > 1
-        ]
-        return list({*chunks, *single_nouns})
-
     def convert_to_multiple_choice(self, question: str, answer: str, num_choices: int = 4):
-        correct = answer.strip()
-        distractors = []
-
-        matched_topic = None
-        question_lower = question.lower()
-        
-        for topic, keywords in TOPIC_KEYWORDS.items():
-            if any(k.lower() in question_lower for k in keywords):
-                matched_topic = topic
-                break
+        return self.convert_many_to_multiple_choice([(question, answer)], num_choices)[0]
+
+    def convert_many_to_multiple_choice(self, qa_pairs, num_choices: int = 4):
+        """
+        Options for every (question, answer) pair. Distractors for the whole
+        batch come from one nearest-neighbour lookup in the keyword
+        embedding index. Rows it cannot fill take key phrases of their
+        question (one batched spaCy pass over all of them), then random
+        keywords of the question's topic.
+        """
+        need = num_choices - 1
+        answers = [str(a).strip() for _, a in qa_pairs]
+        try:
+            picked = get_distractor_index(TOPIC_FILE).select(answers, need)
+        except Exception as e:
+            print(f"[WARN] Distractor index unavailable: {e}")
+            picked = [[] for _ in answers]
 
-        if matched_topic:
-            pool = [kw for kw in TOPIC_KEYWORDS[matched_topic] if kw.lower() != correct.lower()]
-            distractors = random.sample(pool, min(len(pool), num_choices - 1))
-        else:
-            flat_keywords = [
-                kw for kws in TOPIC_KEYWORDS.values() for kw in kws
-                if kw.lower() != correct.lower()
-            ]
-            distractors = random.sample(flat_keywords, min(len(flat_keywords), num_choices - 1))
+        candidates = {}
+        short = [i for i, d in enumerate(picked) if len(d) < need]
+        if short:
+            phrases = self._generate_candidate_distractors_many([str(qa_pairs[i][0]) for i in short])
+            candidates = dict(zip(short, phrases))
 
-        while len(distractors) < num_choices - 1:
-            distractors.append("Unrelated concept")
+        index = get_keyword_index(TOPIC_FILE)
+        topic_keywords = index.topic_keywords
+        results = []
+        for i, ((question, _), correct, distractors) in enumerate(zip(qa_pairs, answers, picked)):
+            distractors = list(distractors)
+            taken = {d.lower() for d in distractors} | {correct.lower()}
+            for cand in candidates.get(i, []):
+                if len(distractors) >= need:
+                    break
+                # skip phrases that are, or are part of, the answer
+                if cand.lower() not in taken and cand.lower() not in correct.lower():
+                    distractors.append(cand)
+                    taken.add(cand.lower())
+            if len(distractors) < need:
+                matched_topic = index.first_topic(question)
+                if matched_topic:
+                    pool = topic_keywords[matched_topic]
+                else:
+                    pool = [kw for kws in topic_keywords.values() for kw in kws]
+                pool = [kw for kw in pool if kw.lower() not in taken]
+                distractors += random.sample(pool, min(len(pool), need - len(distractors)))
 
-        options = distractors + [correct]
-        random.shuffle(options)
-        return options
+            while len(distractors) < need:
+                distractors.append("Unrelated concept")
 
+            options = distractors + [correct]
+            random.shuffle(options)
+            results.append(options)
+        return results
+
+    def _generate_mc_questions(self, topic, content, count):
+        pairs = self._generate_template_then_neural(topic, content, count)
+        options = self.convert_many_to_multiple_choice(pairs)
+        return [
+            {"type": "mc", "question": q, "options": opts, "answer": a}
+            for (q, a), opts in zip(pairs, options)
+        ]
+
+    def _answer_batch(self, batch, batch_size=None):
+        """
+        Run a list of {"question", "context"} dicts through the QA model,
+        batch_size (default QA_BATCH_SIZE) at a time. With micro-batching on,
+        the shared scheduler may merge them with other requests' inputs, but
+        never into a batch larger than that.
+        """
+        if not batch:
+            return []
+        batch_size = max(1, int(batch_size or self.qa_batch_size))
+        if qa_batcher.enabled:
+            return answer_questions(batch, batch_size)
+        resp = self.qa_model(batch, batch_size=batch_size)
+        # the pipeline unwraps single-item inputs into a bare dict
+        return [resp] if isinstance(resp, dict) else list(resp)
 
     def generate_per_keyword(self,
                              topic: str,
                              content: str,
                              total_count: int,
-                             keywords: list) -> list:
-        qa_pairs = []
-
-        present = [kw for kw in keywords if kw.lower() in content.lower()]
+                             keywords: list,
+                             batch_size: int = None,
+                             decoding: str = None) -> list:
+        term_stats.add_document_async(content)
+        content_lower = content.lower()
+        present = []
+        for kw in keywords:
+            if kw.lower() in content_lower and kw not in present:
+                present.append(kw)
 
         pool = self.templates_updated or []
         if not pool:
             pool = [ "Define {keyword} in the context of {topic}?" ]
 
-        for kw in present:
+        # build every keyword question up front, then answer them in batches
+        batch = []
+        for kw in present[:total_count]:
             tpl = random.choice(pool)
             try:
                 q = tpl.format(keyword=kw, topic=topic)
             except Exception:
                 q = f"Define {kw} in the context of {topic}?"
-            ans = self.qa_model({"question": q, "context": content})["answer"]
-            qa_pairs.append((q, clean_answer(ans)))
-            if len(qa_pairs) >= total_count:
-                break
+            batch.append({"question": q, "context": content})
+
+        qa_pairs = []
+        for item, out in zip(batch, self._answer_batch(batch, batch_size)):
+            ans = clean_answer(out.get("answer", ""))
+            if ans:
+                qa_pairs.append((item["question"], ans))
 
+        # one fallback fill for the whole quiz, not one per keyword
         if len(qa_pairs) < total_count:
             need = total_count - len(qa_pairs)
             tail = self.generate_questions(
                 topic, content,
                 num_questions=need,
                 open_count=need,
-                mc_count=0
+                mc_count=0,
+                decoding=decoding
             )
             qa_pairs.extend(tail)
 
         return qa_pairs[:total_count]
-    def _generate_candidate_distractors(self, question):
+    def _generate_candidate_distractors_many(self, questions):
+        """Candidate distractor words for every question, from one batched spaCy pass."""
         try:
-            raw = extract_key_phrases(question)
-            if isinstance(raw, np.ndarray):
-                raw = raw.tolist()
-            flat = []
-            for x in raw:
-                if isinstance(x, (list, tuple)):
-                    flat += [str(w) for w in x]
-                else:
-                    flat.append(str(x))
+            phrases = extract_key_phrases_many(questions)
+        except Exception:
+            phrases = [[] for _ in questions]
+
+        results = []
+        for question, raw in zip(questions, phrases):
             # dedupe, strip
             seen, cands = set(), []
-            for w in flat:
-                w = w.strip()
+            for w in raw:
+                w = str(w).strip()
                 lw = w.lower()
                 if w and lw not in seen:
                     seen.add(lw)
                     cands.append(w)
-            if cands:
-                return cands
-        except Exception:
-            pass
-
-        words = re.findall(r"\b[A-Za-z]{4,}\b", question)
-        seen, cands = set(), []
-        for w in words:
-            lw = w.lower()
-            if lw not in seen:
-                seen.add(lw)
-                cands.append(w)
-        return cands
+            if not cands:
+                for w in re.findall(r"\b[A-Za-z]{4,}\b", question):
+                    lw = w.lower()
+                    if lw not in seen:
+                        seen.add(lw)
+                        cands.append(w)
+            results.append(cands)
+        return results
     def generate_questions(self,
                            topic: str,
                            content: str,
                            num_questions: int = 10,
                            open_count: int = None,
-                           mc_count: int = None) -> list:
+                           mc_count: int = None,
+                           progress_cb=None,
+                           decoding: str = None) -> list:
+        """
+        progress_cb(stage, items), if given, is called with the questions
+        accepted so far as generation proceeds; it may raise to abort.
+        decoding names one of DECODING_PROFILES for the flan-t5 fallback.
+        """
+        final = []
+        for stage, item in self.iter_questions(
+            topic, content, num_questions, open_count, mc_count, decoding=decoding
+        ):
+            if item is not None:
+                final.append(item)
+            elif progress_cb:
+                progress_cb(stage, final)
+
+        if progress_cb:
+            progress_cb("done", final)
+        return final
+
+    def iter_questions(self,
+                       topic: str,
+                       content: str,
+                       num_questions: int = 10,
+                       open_count: int = None,
+                       mc_count: int = None,
+                       decoding: str = None):
+        """
+        Generator form of generate_questions. Yields (stage, question) for
+        each question as soon as it is accepted and deduplicated, and
+        (stage, None) at the end of every QA batch / generation stage.
+        Stops as soon as num_questions have been yielded.
+        """
+        decoding = resolve_decoding(decoding)
         if open_count is None or mc_count is None:
             open_count = num_questions
             mc_count   = 0
 
+        # source texts feed the corpus idf used for key-phrase extraction
+        term_stats.add_document_async(content)
         print(f"Generating {num_questions} questions ({open_count} open, {mc_count} MC)")
 
-        candidates = []
-        if open_count > 0:
-            candidates += self._generate_open_questions(topic, content, open_count)
-        if mc_count > 0:
-            candidates += self._generate_mc_questions(topic, content, mc_count)
-
-        # Dedupe & trim to num_questions
-        seen, final = set(), []
-        for item in candidates:
+        def events():
+            if open_count > 0:
+                yield from self._iter_template_then_neural(
+                    topic, content, open_count, decoding=decoding
+                )
+            if mc_count > 0:
+                for item in self._generate_mc_questions(topic, content, mc_count):
+                    yield "mc", item
+                yield "mc", None
+
+        if num_questions <= 0:
+            return
+        seen, emitted = set(), 0
+        for stage, item in events():
+            if item is None:
+                yield stage, None
+                continue
             key = json.dumps(item, sort_keys=True) if isinstance(item, dict) else tuple(item)
-            if key not in seen:
-                seen.add(key)
-                final.append(item)
-            if len(final) >= num_questions:
-                break
+            if key in seen:
+                continue
+            seen.add(key)
+            emitted += 1
+            yield stage, item
+            if emitted >= num_questions:
+                return
 
-        return final
-    def _generate_open_questions(self, topic, content, count):
-        return (
-            self.generate_questions(
-                topic, content, num_questions=count, open_count=count, mc_count=0
-            )
-            if False
-            else self._generate_template_then_neural(topic, content, count)
-        )
+    def _generate_template_then_neural(self, topic, content, count, progress_cb=None, decoding=None):
+        results = []
+        for stage, item in self._iter_template_then_neural(topic, content, count, decoding):
+            if item is not None:
+                results.append(item)
+            elif progress_cb:
+                progress_cb(stage, results)
+        return results[:count]
 
-    def _generate_template_then_neural(self, topic, content, count):
+    def _iter_template_then_neural(self, topic, content, count, decoding=None):
+        """
+        Yields ("template" | "neural", (question, answer)) for each accepted
+        pair, and (stage, None) after each QA batch and after the neural pass.
+        """
         results = []
         used_answers = set()
         batch = []
-        selected = random.sample(self.templates, min(5 * count, len(self.templates)))
-        for tpl in selected:
+        # high-yield templates first, so fewer QA passes reach `count`
+        for tpl in template_stats.rank(self.templates, k=5 * count):
             if tpl.count("{}") == 1:
                 q = tpl.format(topic)
             else:
                 q = tpl.format(topic, topic)
             if f"{topic} and {topic}" in q or f"{topic} vs {topic}" in q:
                 continue
-            batch.append({"question": q, "context": content})
+            batch.append((tpl, {"question": q, "context": content}))
 
-        for i in range(0, len(batch), 5):
-            resp = self.qa_model(batch[i : i + 5])
-            for idx, out in enumerate(resp):
-                question = batch[i + idx]["question"]
-                raw = out.get("answer", "") if isinstance(out, dict) else out
-                score = out.get("score", 0) if isinstance(out, dict) else None
-                ans = clean_answer(raw)
-                if score is not None and score < 0.05:
-                    continue
-                if not ans or ans in used_answers:
-                    continue
-                used_answers.add(ans)
-                results.append((question, ans))
-                if len(results) >= count:
-                    return results
+        outcomes = {}
+        def note(tpl, outcome):
+            counts = outcomes.setdefault(tpl, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+        i = 0
+        try:
+            while i < len(batch) and len(results) < count:
+                # size the next batch to what is still missing at the expected yield
+                ahead = batch[i : i + self.qa_batch_size]
+                rate = sum(template_stats.expected_yield(t) for t, _ in ahead) / len(ahead)
+                step = min(len(ahead), max(1, math.ceil((count - len(results)) / max(rate, 0.05))))
+                chunk, i = batch[i : i + step], i + step
+
+                resp = self._answer_batch([item for _, item in chunk])
+                for (tpl, item), out in zip(chunk, resp):
+                    raw = out.get("answer", "") if isinstance(out, dict) else out
+                    score = out.get("score", 0) if isinstance(out, dict) else None
+                    ans = clean_answer(raw)
+                    if score is not None and score < 0.05:
+                        note(tpl, "low_score")
+                        continue
+                    if not ans:
+                        note(tpl, "empty")
+                        continue
+                    if ans in used_answers:
+                        note(tpl, "duplicate")
+                        continue
+                    note(tpl, "accepted")
+                    used_answers.add(ans)
+                    results.append((item["question"], ans))
+                    yield "template", results[-1]
+                    if len(results) >= count:
+                        break
+                yield "template", None
+        finally:
+            # also runs when the consumer stops early
+            template_stats.record(outcomes)
 
         if self.use_neural and len(results) < count:
-            extras = self._generate_neural_questions(content)
+            extras = self._generate_neural_questions(content, count=count, decoding=decoding)
             for q, a in extras:
                 if len(results) >= count:
                     break
                 if (q, a) not in results:
                     results.append((q, a))
-
-        return results[:count]
+                    yield "neural", (q, a)
+            yield "neural", None
 
 
 
@@ -284,22 +495,111 @@ class QuestionGenerator:
                 i += 1
         return qa
 
-    def _generate_neural_questions(self, content):
-        prompt = f"Generate 10 educational questions with answers from this text:\n\n{content}"
+    def _chunk_content(self, content,
+                       window_tokens=NEURAL_WINDOW_TOKENS,
+                       overlap=NEURAL_WINDOW_OVERLAP):
+        ids = self.flan_tokenizer(
+            content, add_special_tokens=False, truncation=False
+        )["input_ids"]
+        if not ids:
+            return []
+        step = max(1, window_tokens - overlap)
+        windows = []
+        for start in range(0, len(ids), step):
+            windows.append(self.flan_tokenizer.decode(
+                ids[start : start + window_tokens], skip_special_tokens=True
+            ))
+            if start + window_tokens >= len(ids):
+                break
+        return windows
+
+    @staticmethod
+    def _select_windows(windows, max_windows=NEURAL_MAX_WINDOWS):
+        if len(windows) <= max_windows:
+            return windows
+        # evenly spaced, so coverage still spans the whole document
+        idx = np.linspace(0, len(windows) - 1, max_windows).round().astype(int)
+        return [windows[i] for i in sorted(set(idx.tolist()))]
+
+    def _flan_generate(self, prompts, decoding=None):
+        decoding = resolve_decoding(decoding)
         inputs = self.flan_tokenizer(
-            prompt, return_tensors="pt", truncation=True, max_length=1024
+            prompts, return_tensors="pt", padding=True,
+            truncation=True, max_length=NEURAL_WINDOW_TOKENS + 32
         )
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # int8 and ONNX backends always run on CPU, so follow the model
+        model = self.flan_model
+        inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        t0 = time.perf_counter()
         with torch.no_grad():
-            out_ids = self.flan_model.generate(
-                **inputs,
-                max_new_tokens=512,
-                num_beams=4,
-                temperature=0.7,
-                early_stopping=True
-            )
-        decoded = self.flan_tokenizer.decode(out_ids[0], skip_special_tokens=True)
-        return self._parse_flan_output(decoded)
+            out_ids = model.generate(**inputs, **DECODING_PROFILES[decoding])
+        elapsed = time.perf_counter() - t0
+
+        pad_id = self.flan_tokenizer.pad_token_id
+        n_tokens = int((out_ids != pad_id).sum()) if pad_id is not None else out_ids.numel()
+        _record_decoding(decoding, len(prompts), n_tokens, elapsed)
+        return self.flan_tokenizer.batch_decode(out_ids, skip_special_tokens=True)
+
+    def _generate_neural_questions(self, content, count=10, decoding=None):
+        if count <= 0:
+            return []
+        # only as many windows as the shortfall needs, at a few questions each
+        per_window = min(10, -(-count // NEURAL_MAX_WINDOWS) + 1)
+        n_windows  = min(NEURAL_MAX_WINDOWS, -(-count // per_window) + NEURAL_SPARE_WINDOWS)
+        windows = self._select_windows(self._chunk_content(content), n_windows)
+        if not windows:
+            return []
+
+        # map: ask every window for its share of the questions, plus a spare
+        per_window = min(10, -(-count // len(windows)) + 1)
+        prompts = [
+            f"Generate {per_window} educational questions with answers from this text:\n\n{w}"
+            for w in windows
+        ]
+        batches = [
+            prompts[i : i + NEURAL_BATCH_SIZE]
+            for i in range(0, len(prompts), NEURAL_BATCH_SIZE)
+        ]
+        generate = lambda batch: self._flan_generate(batch, decoding)
+        workers = NEURAL_WORKERS if NEURAL_WORKERS > 1 and len(batches) > 1 else 1
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        per_window_qa = []
+        try:
+            # one wave of batches per worker; stop once `count` are usable
+            for i in range(0, len(batches), workers):
+                wave = batches[i : i + workers]
+                for texts in (pool.map(generate, wave) if pool else map(generate, wave)):
+                    per_window_qa += [self._parse_flan_output(text) for text in texts]
+                if len(self._merge_window_questions(per_window_qa, count)) >= count:
+                    break
+        finally:
+            if pool:
+                pool.shutdown()
+
+        # reduce: merge per-window candidates into the requested count
+        return self._merge_window_questions(per_window_qa, count)
+
+    @staticmethod
+    def _merge_window_questions(per_window, count):
+        """
+        Round-robin over windows (each window's own ranking is kept), so the
+        first `count` questions are spread across the document. Duplicate
+        questions and answers rejected by clean_answer are dropped.
+        """
+        seen, merged = set(), []
+        depth = max((len(qa) for qa in per_window), default=0)
+        for rank in range(depth):
+            for qa in per_window:
+                if rank >= len(qa):
+                    continue
+                q, a = qa[rank]
+                key = re.sub(r"\W+", " ", q.lower()).strip()
+                a = clean_answer(a)
+                if not a or key in seen:
+                    continue
+                seen.add(key)
+                merged.append((q, a))
+        return merged[:count]
 
     def _parse_flan_output(self, text):
         qa = []
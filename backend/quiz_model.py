@@ -1,76 +1,37 @@
-import sqlite3
 import json
 import os
 from fpdf import FPDF
-
-DB_PATH = "quizzes.db"
+from db import connection, transaction
+from migrations import migrate
+from answer_key import question_rows, invalidate as invalidate_answer_key
+from queries import CLASS_ROSTER, QUIZ_ASSIGNEES, QUIZZES_BY_ACTIVE
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    # quizzes table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS quizzes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            topic TEXT NOT NULL,
-            data TEXT NOT NULL,
-            created_by TEXT DEFAULT 'admin',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            code TEXT,
-            active INTEGER NOT NULL DEFAULT 1
-        )
-    """)
-    # assignments table: now with due_at and time_limit
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS assignments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            quiz_id INTEGER,
-            student_id TEXT,
-            status TEXT DEFAULT 'assigned',
-            assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            due_at TEXT,
-            score INTEGER DEFAULT 0,
-            submitted_at TIMESTAMP,
-            time_limit INTEGER
-        )
-    """)
-    # migrate older DBs
-    cols = [row[1] for row in c.execute("PRAGMA table_info(assignments)")]
-    if "due_at" not in cols:
-        c.execute("ALTER TABLE assignments ADD COLUMN due_at TEXT")
-    if "time_limit" not in cols:
-        c.execute("ALTER TABLE assignments ADD COLUMN time_limit INTEGER")
-    # students table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT UNIQUE NOT NULL,
-            class_id TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
+    """Bring quizzes.db up to the current schema (see migrations.py)."""
+    migrate()
 
 def save_quiz(title, topic, qa_pairs, code, created_by="admin"):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO quizzes (title, topic, data, code, created_by) VALUES (?, ?, ?, ?, ?)",
-        (title, topic, json.dumps(qa_pairs), code, created_by)
+    with transaction() as conn:
+        c = conn.execute(
+            "INSERT INTO quizzes (title, topic, data, code, created_by) VALUES (?, ?, ?, ?, ?)",
+            (title, topic, json.dumps(qa_pairs), code, created_by)
+        )
+        _store_questions(conn, c.lastrowid, qa_pairs)
+        return c.lastrowid
+
+def _store_questions(conn, quiz_id, qa_pairs):
+    conn.execute("DELETE FROM questions WHERE quiz_id = ?", (quiz_id,))
+    conn.executemany(
+        "INSERT INTO questions (quiz_id, position, kind, question, answer, answer_norm, options) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        question_rows(quiz_id, qa_pairs)
     )
-    conn.commit()
-    quiz_id = c.lastrowid
-    conn.close()
-    return quiz_id
 
 def get_quiz(quiz_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT title, topic, data FROM quizzes WHERE id = ?", (quiz_id,))
-    row = c.fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT title, topic, data FROM quizzes WHERE id = ?", (quiz_id,)
+        ).fetchone()
     if row:
         return {
             "title": row[0],
@@ -80,30 +41,19 @@ def get_quiz(quiz_id):
     return None
 
 def update_quiz(quiz_id, title, topic, qa_pairs):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "UPDATE quizzes SET title = ?, topic = ?, data = ? WHERE id = ?",
-        (title, topic, json.dumps(qa_pairs), quiz_id)
-    )
-    conn.commit()
-    updated = c.rowcount
-    conn.close()
-    return bool(updated)
+    with transaction() as conn:
+        c = conn.execute(
+            "UPDATE quizzes SET title = ?, topic = ?, data = ?, version = version + 1 WHERE id = ?",
+            (title, topic, json.dumps(qa_pairs), quiz_id)
+        )
+        if not c.rowcount:
+            return False
+        _store_questions(conn, quiz_id, qa_pairs)
+    invalidate_answer_key(quiz_id)
+    return True
 
 def export_quiz_json(quiz_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT title, topic, data FROM quizzes WHERE id = ?", (quiz_id,))
-    row = c.fetchone()
-    conn.close()
-    if not row:
-        return {}
-    return {
-        "title": row[0],
-        "topic": row[1],
-        "questions": json.loads(row[2])
-    }
+    return get_quiz(quiz_id) or {}
 
 def export_quiz_pdf(quiz_id, filename=None):
     quiz = get_quiz(quiz_id)
@@ -168,33 +118,63 @@ def export_quiz_pdf(quiz_id, filename=None):
     return path
 
 def assign_quiz_to_student(quiz_id, student_id, due_at=None, time_limit=None):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO assignments (quiz_id, student_id, due_at, time_limit) VALUES (?, ?, ?, ?)",
-        (quiz_id, student_id, due_at, time_limit)
-    )
-    conn.commit()
-    conn.close()
-    return True
+    """True if a new assignment row was inserted."""
+    counts = assign_quizzes([quiz_id], student_ids=[student_id], due_at=due_at, time_limit=time_limit)
+    return counts["assigned"] > 0
+
+def assign_quizzes(quiz_ids, class_ids=(), student_ids=(), due_at=None, time_limit=None):
+    """
+    Assign every quiz in quiz_ids to every student in class_ids plus
+    student_ids, in one transaction. Students who already hold a quiz are
+    skipped. Returns the counts, plus any quiz or class ids that matched
+    nothing.
+    """
+    quiz_ids  = list(dict.fromkeys(quiz_ids))
+    class_ids = list(dict.fromkeys(class_ids))
+    with transaction(immediate=True) as conn:
+        known = set()
+        for quiz_id in quiz_ids:
+            if conn.execute("SELECT 1 FROM quizzes WHERE id = ?", (quiz_id,)).fetchone():
+                known.add(quiz_id)
+
+        roster, empty_classes = [], []
+        for class_id in class_ids:
+            members = [r[0] for r in conn.execute(CLASS_ROSTER, (class_id,))]
+            if not members:
+                empty_classes.append(class_id)
+            roster += members
+        # student ids are TEXT; JSON clients may send numbers
+        roster = list(dict.fromkeys(roster + [str(s) for s in student_ids if s]))
+
+        rows, skipped = [], 0
+        for quiz_id in quiz_ids:
+            if quiz_id not in known:
+                continue
+            have = {r[0] for r in conn.execute(QUIZ_ASSIGNEES, (quiz_id,))}
+            for student_id in roster:
+                if student_id in have:
+                    skipped += 1
+                else:
+                    rows.append((quiz_id, student_id, due_at, time_limit))
+        conn.executemany(
+            "INSERT INTO assignments (quiz_id, student_id, due_at, time_limit) VALUES (?, ?, ?, ?)",
+            rows
+        )
+    return {
+        "quizzes":          len(known),
+        "students":         len(roster),
+        "assigned":         len(rows),
+        "already_assigned": skipped,
+        "missing_quizzes":  [q for q in quiz_ids if q not in known],
+        "empty_classes":    empty_classes,
+    }
 
 def set_quiz_active(quiz_id, active: bool):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE quizzes SET active = ? WHERE id = ?", (1 if active else 0, quiz_id))
-    conn.commit()
-    changed = c.rowcount
-    conn.close()
-    return bool(changed)
+    with transaction() as conn:
+        c = conn.execute("UPDATE quizzes SET active = ? WHERE id = ?", (1 if active else 0, quiz_id))
+        return bool(c.rowcount)
 
 def list_quizzes(active: bool = True):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute(
-        "SELECT id, title, topic, data, code, created_at, active FROM quizzes WHERE active = ? ORDER BY created_at DESC",
-        (1 if active else 0,)
-    )
-    rows = c.fetchall()
-    conn.close()
+    with connection() as conn:
+        rows = conn.execute(QUIZZES_BY_ACTIVE, (1 if active else 0,)).fetchall()
     return [dict(r) for r in rows]
@@ -1,18 +1,30 @@
 # backend/quiz_routes.py
 import os
 import re
-import sqlite3
 import string
 import random
 import json
-from flask import request, jsonify, send_file
+import time
+from flask import request, jsonify, send_file, Response, stream_with_context
 from quiz_model import (
     init_db, save_quiz, get_quiz, update_quiz,
     export_quiz_json, export_quiz_pdf,
-    assign_quiz_to_student, set_quiz_active,
+    assign_quizzes, set_quiz_active,
     list_quizzes as model_list_quizzes,
 )
-from question_generation import QuestionGenerator
+from model_registry import registry, get_question_generator, get_topic_detector
+from nlp_cache import cache, make_key
+from db import connection
+from queries import QUIZ_BY_CODE
+from distractor_index import get_distractor_index
+from question_generation import resolve_decoding, resolve_batch_size, decoding_stats
+from template_stats import template_stats
+from grading import (
+    get_settings as grading_settings, set_settings as set_grading_settings, regrade_quiz,
+)
+from generation_jobs import (
+    init_jobs_table, submit_job, get_job, cancel_job, JobQueueFull,
+)
 
 DATA_FILE = os.path.join(
     os.path.dirname(__file__),
@@ -25,6 +37,7 @@ def generate_quiz_code(length=10):
 def register_quiz_routes(app):
     # Initialize DB
     init_db()
+    init_jobs_table()
 
     # ─── SAVE QUIZ ────────────────────────────────────────────────────────────
     @app.route("/api/quiz/save", methods=["POST"])
@@ -48,6 +61,11 @@ def register_quiz_routes(app):
             open_count   = int(data.get("open_count", total))
             mc_count     = int(data.get("mc_count",0))
             with_summary = bool(data.get("with_summary", False))
+            try:
+                decoding   = resolve_decoding(data.get("decoding"))
+                batch_size = resolve_batch_size(data.get("batch_size"))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
 
             # branch: teacher-supplied keywords
             if "keywords" in data:
@@ -65,18 +83,18 @@ def register_quiz_routes(app):
                       400
                     )
 
-                qg = QuestionGenerator()
-                questions = []
-                for kw in keywords:
-                    qs = qg.generate_questions(
-                      topic=f"{topic} – {kw}",
-                      content=text,
-                      num_questions=1,
-                      open_count=1,
-                      mc_count=0
-                    )
-                    questions.extend(qs)
-                questions = questions[:total]
+                qg = get_question_generator()
+                questions = cache.memoize(
+                    "generate.keywords", text,
+                    lambda: qg.generate_per_keyword(
+                        topic, text, total, keywords,
+                        batch_size=batch_size,
+                        decoding=decoding
+                    ),
+                    refresh=bool(data.get("fresh")),
+                    topic=topic, total=total, keywords=keywords,
+                    **qg.cache_params(decoding)
+                )
 
                 payload = {"questions": questions}
                 if with_summary:
@@ -91,14 +109,25 @@ def register_quiz_routes(app):
         open_count    = int(data.get("open_count", total))
         mc_count      = int(data.get("mc_count",0))
         with_summary  = bool(data.get("with_summary", False))
+        try:
+            decoding = resolve_decoding(data.get("decoding"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        qg = QuestionGenerator()
-        questions = qg.generate_questions(
-          topic=topic,
-          content=text,
-          num_questions=total,
-          open_count=open_count,
-          mc_count=mc_count
+        qg = get_question_generator()
+        questions = cache.memoize(
+          "generate", text,
+          lambda: qg.generate_questions(
+            topic=topic,
+            content=text,
+            num_questions=total,
+            open_count=open_count,
+            mc_count=mc_count,
+            decoding=decoding
+          ),
+          refresh=bool(data.get("fresh")),
+          topic=topic, total=total, open_count=open_count, mc_count=mc_count,
+          **qg.cache_params(decoding)
         )
 
         payload = {"questions": questions}
@@ -106,6 +135,130 @@ def register_quiz_routes(app):
             payload["summary"] = qg.summarize(text)
         return jsonify(payload), 200
 
+    # ─── STREAMING GENERATION (SSE) ───────────────────────────────────────────
+    @app.route("/api/quiz/generate/stream", methods=["POST"])
+    def generate_quiz_stream():
+        data         = request.get_json(force=True) or {}
+        text         = data.get("text","")
+        topic        = data.get("topic","")
+        total        = int(data.get("total_count",10))
+        open_count   = int(data.get("open_count", total))
+        mc_count     = int(data.get("mc_count",0))
+        with_summary = bool(data.get("with_summary", False))
+        try:
+            decoding = resolve_decoding(data.get("decoding"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        qg  = get_question_generator()
+        # same key as /api/quiz/generate, so either endpoint can reuse the other's result
+        key = make_key(
+            "generate", text,
+            topic=topic, total=total, open_count=open_count, mc_count=mc_count,
+            **qg.cache_params(decoding)
+        )
+
+        def event(name, payload):
+            return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+        def stream():
+            started   = time.perf_counter()
+            first     = None
+            questions = []
+            cached    = None if data.get("fresh") else cache.get("generate", key)
+            yield event("start", {"total_count": total, "cached": cached is not None})
+            try:
+                if cached is not None:
+                    source = (("cache", q) for q in cached)
+                else:
+                    source = qg.iter_questions(
+                        topic, text, total, open_count, mc_count, decoding=decoding
+                    )
+                for stage, item in source:
+                    if item is None:
+                        continue
+                    elapsed = time.perf_counter() - started
+                    if first is None:
+                        first = elapsed
+                    questions.append(item)
+                    yield event("question", {
+                        "index":    len(questions) - 1,
+                        "stage":    stage,
+                        "question": item,
+                        "elapsed":  round(elapsed, 3),
+                    })
+                if cached is None:
+                    cache.put("generate", key, questions)
+
+                summary = {
+                    "count":                  len(questions),
+                    "time_to_first_question": round(first, 3) if first is not None else None,
+                    "total_seconds":          round(time.perf_counter() - started, 3),
+                    "decoding":               decoding,
+                }
+                if with_summary:
+                    summary["summary"] = qg.summarize(text)
+                print(f"[INFO] Streamed {len(questions)} questions, first after "
+                      f"{summary['time_to_first_question']}s, total {summary['total_seconds']}s")
+                yield event("done", summary)
+            except Exception as e:
+                yield event("error", {"error": str(e)})
+
+        return Response(
+            stream_with_context(stream()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # ─── DECODING PROFILES ────────────────────────────────────────────────────
+    @app.route("/api/quiz/decoding_profiles", methods=["GET"])
+    def list_decoding_profiles():
+        return jsonify(decoding_stats()), 200
+
+    # ─── TEMPLATE YIELD RATES ─────────────────────────────────────────────────
+    @app.route("/api/quiz/template_stats", methods=["GET"])
+    def list_template_stats():
+        limit = request.args.get("limit", type=int)
+        return jsonify({"templates": template_stats.summary(limit)}), 200
+
+    # ─── ASYNC GENERATION JOBS ────────────────────────────────────────────────
+    @app.route("/api/quiz/generate/jobs", methods=["POST"])
+    def create_generation_job():
+        data  = request.get_json(force=True) or {}
+        total = int(data.get("total_count",10))
+        try:
+            decoding = resolve_decoding(data.get("decoding"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        params = {
+            "text":          data.get("text",""),
+            "topic":         data.get("topic",""),
+            "num_questions": total,
+            "open_count":    int(data.get("open_count", total)),
+            "mc_count":      int(data.get("mc_count",0)),
+            "with_summary":  bool(data.get("with_summary", False)),
+            "decoding":      decoding,
+        }
+        try:
+            job_id = submit_job(params)
+        except JobQueueFull as e:
+            return jsonify({"error": str(e)}), 429
+        return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+    @app.route("/api/quiz/generate/jobs/<job_id>", methods=["GET"])
+    def generation_job_status(job_id):
+        job = get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job), 200
+
+    @app.route("/api/quiz/generate/jobs/<job_id>", methods=["DELETE"])
+    def cancel_generation_job(job_id):
+        status = cancel_job(job_id)
+        if status is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify({"job_id": job_id, "status": status}), 200
+
     # ─── MULTIPLE‐CHOICE GENERATION ───────────────────────────────────────────
     @app.route("/api/quiz/generate_mc", methods=["POST"])
     def generate_multiple_choice():
@@ -113,7 +266,7 @@ def register_quiz_routes(app):
         question = data.get("question","")
         answer   = data.get("answer","")
         num      = int(data.get("num_choices",4))
-        opts     = QuestionGenerator().convert_to_multiple_choice(
+        opts     = get_question_generator().convert_to_multiple_choice(
                       question, answer, num
                    )
         return jsonify({"options": opts}), 200
@@ -130,22 +283,19 @@ def register_quiz_routes(app):
 
         if not keywords:
             return jsonify({"error": "No keywords provided"}), 400
+        try:
+            decoding   = resolve_decoding(data.get("decoding"))
+            batch_size = resolve_batch_size(data.get("batch_size"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        qg = QuestionGenerator()
-        questions = []
-        # call generate_per_keyword exactly
-        for kw in keywords:
-            qa = qg.generate_per_keyword(
-                topic,       # positional 1st arg
-                text,        # positional 2nd arg
-                1,           # total_count=1
-                [kw]         # keywords list
-            )
-            questions.extend(qa)
-            if len(questions) >= total:
-                break
-
-        questions = questions[:total]
+        qg = get_question_generator()
+        # all keyword questions go through QA in batches, one shared fallback
+        questions = qg.generate_per_keyword(
+            topic, text, total, keywords,
+            batch_size=batch_size,
+            decoding=decoding
+        )
         payload = {"questions": questions}
         if with_summary:
             payload["summary"] = qg.summarize(text)
@@ -176,6 +326,11 @@ def register_quiz_routes(app):
             f.seek(0)
             json.dump(data, f, indent=2, sort_keys=True)
             f.truncate()
+        # embed just the new topic/keywords now if the embedder is already
+        # resident; otherwise they are picked up on the next lookup
+        if registry.is_loaded("minilm"):
+            get_topic_detector(DATA_FILE).sync_topic_embeddings()
+            get_distractor_index(DATA_FILE).sync()
         return jsonify({"status":"added"}), 201
     # ─── EXPORT, ASSIGN, LIST, ETC. (unchanged) ─────────────────────────────
     @app.route("/api/quiz/<int:quiz_id>/json", methods=["GET"])
@@ -198,8 +353,22 @@ def register_quiz_routes(app):
         time_limit = data.get("time_limit")  # <-- ADD THIS
         if not quiz_id or not student_id:
             return jsonify({"error": "quiz_id and student_id required"}), 400
-        assign_quiz_to_student(quiz_id, student_id, due_at, time_limit)  # <-- PASS IT IN
-        return jsonify({"status":"success", "due_at": due_at}), 201
+        counts = assign_quizzes([quiz_id], student_ids=[student_id], due_at=due_at, time_limit=time_limit)
+        if counts["missing_quizzes"]:
+            return jsonify({"error": "Quiz not found"}), 404
+        if not counts["assigned"]:
+            # the existing assignment, and its due date, are left as they were
+            return jsonify({
+                "status":           "already_assigned",
+                "assigned":         0,
+                "already_assigned": counts["already_assigned"],
+            }), 200
+        return jsonify({
+            "status":           "success",
+            "assigned":         counts["assigned"],
+            "already_assigned": counts["already_assigned"],
+            "due_at":           due_at
+        }), 201
 
 
     @app.route("/api/quiz/assign/class", methods=["POST"])
@@ -210,19 +379,29 @@ def register_quiz_routes(app):
         due_at   = data.get("due_at")
         if not quiz_id or not class_id:
             return jsonify({"error":"Missing quiz_id or class_id"}), 400
-        conn = sqlite3.connect("quizzes.db")
-        c    = conn.cursor()
-        c.execute("SELECT student_id FROM students WHERE class_id = ?", (class_id,))
-        student_ids = [r[0] for r in c.fetchall()]
-        conn.close()
-        for sid in student_ids:
-            assign_quiz_to_student(quiz_id, sid, due_at)
+        counts = assign_quizzes([quiz_id], class_ids=[class_id], due_at=due_at)
         return jsonify({
-            "status":      "success",
-            "assigned_to": len(student_ids),
-            "due_at":      due_at
+            "status":           "success",
+            "assigned_to":      counts["assigned"],
+            "already_assigned": counts["already_assigned"],
+            "due_at":           due_at
         }), 200
 
+    # ─── BULK ASSIGNMENT: many quizzes × many classes / students ──────────────
+    @app.route("/api/quiz/assign/bulk", methods=["POST"])
+    def assign_quizzes_bulk():
+        data        = request.get_json(force=True) or {}
+        quiz_ids    = data.get("quiz_ids") or []
+        class_ids   = data.get("class_ids") or []
+        student_ids = data.get("student_ids") or []
+        if not quiz_ids or not (class_ids or student_ids):
+            return jsonify({"error": "quiz_ids and class_ids or student_ids required"}), 400
+        counts = assign_quizzes(
+            quiz_ids, class_ids=class_ids, student_ids=student_ids,
+            due_at=data.get("due_at"), time_limit=data.get("time_limit")
+        )
+        return jsonify({"status": "success", **counts}), 200
+
     @app.route("/api/quiz/join", methods=["POST"])
     def join_quiz_by_code():
         data       = request.get_json(force=True)
@@ -231,14 +410,11 @@ def register_quiz_routes(app):
         due_at     = data.get("due_at")
         if not code or not student_id:
             return jsonify({"error":"Missing quiz code or student_id"}), 400
-        conn = sqlite3.connect("quizzes.db")
-        c    = conn.cursor()
-        c.execute("SELECT id FROM quizzes WHERE code = ?", (code,))
-        row  = c.fetchone()
-        conn.close()
+        with connection() as conn:
+            row = conn.execute(QUIZ_BY_CODE, (code,)).fetchone()
         if not row:
             return jsonify({"error":"Invalid quiz code"}), 404
-        assign_quiz_to_student(row[0], student_id, due_at)
+        assign_quizzes([row[0]], student_ids=[student_id], due_at=due_at)
         return jsonify({
             "status":     "success",
             "quiz_id":    row[0],
@@ -248,16 +424,14 @@ def register_quiz_routes(app):
 
     @app.route("/api/quizzes/all", methods=["GET"])
     def list_all_quizzes():
-        conn = sqlite3.connect("quizzes.db")
-        c    = conn.cursor()
-        c.execute(
-          "SELECT id,title,topic,code,created_at FROM quizzes ORDER BY created_at DESC"
-        )
+        with connection() as conn:
+            rows = conn.execute(
+              "SELECT id,title,topic,code,created_at FROM quizzes ORDER BY created_at DESC"
+            ).fetchall()
         quizzes = [
           {"id":r[0],"title":r[1],"topic":r[2],"code":r[3],"created_at":r[4]}
-          for r in c.fetchall()
+          for r in rows
         ]
-        conn.close()
         return jsonify(quizzes)
 
     @app.route("/api/quizzes", methods=["GET"])
@@ -278,6 +452,38 @@ def register_quiz_routes(app):
             return jsonify({"error":"Quiz not found"}), 404
         return jsonify({"quiz_id":quiz_id}), 200
 
+    # ─── GRADING: per-quiz thresholds and batch regrade ───────────────────────
+    @app.route("/api/quiz/<int:quiz_id>/grading", methods=["GET"])
+    def get_grading_settings(quiz_id):
+        if get_quiz(quiz_id) is None:
+            return jsonify({"error":"Quiz not found"}), 404
+        return jsonify(grading_settings(quiz_id)), 200
+
+    @app.route("/api/quiz/<int:quiz_id>/grading", methods=["PUT"])
+    def update_grading_settings(quiz_id):
+        data = request.get_json(force=True) or {}
+        if get_quiz(quiz_id) is None:
+            return jsonify({"error":"Quiz not found"}), 404
+        try:
+            settings = set_grading_settings(
+                quiz_id,
+                mode=data.get("mode"),
+                overlap_threshold=data.get("overlap_threshold"),
+                semantic_threshold=data.get("semantic_threshold")
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        if data.get("regrade"):
+            settings["regrade"] = regrade_quiz(quiz_id)
+        return jsonify(settings), 200
+
+    @app.route("/api/quiz/<int:quiz_id>/regrade", methods=["POST"])
+    def regrade_quiz_route(quiz_id):
+        result = regrade_quiz(quiz_id)
+        if result is None:
+            return jsonify({"error":"Quiz not found"}), 404
+        return jsonify(result), 200
+
     @app.route("/api/quiz/<int:quiz_id>/activate", methods=["POST"])
     def activate_quiz(quiz_id):
         if not set_quiz_active(quiz_id, True):
@@ -0,0 +1,72 @@
+# backend/spacy_service.py
+"""
+One shared en_core_web_sm pipeline for the whole backend.
+
+The model is loaded once through the model registry. Callers pick a
+component profile instead of loading their own copy, so components they do
+not need (parser, NER, ...) are skipped per call, and batches of texts go
+through `nlp.pipe` in one call.
+"""
+import os
+
+from model_registry import registry
+
+SPACY_BATCH_SIZE = int(os.environ.get("SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS  = int(os.environ.get("SPACY_N_PROCESS", "1"))
+# whole documents are parsed in pieces of at most this many characters;
+# spaCy refuses texts longer than nlp.max_length (1,000,000 by default)
+SPACY_CHUNK_CHARS = int(os.environ.get("SPACY_CHUNK_CHARS", "100000"))
+
+# profile -> components to disable
+PROFILES = {
+    # tokenizer only: is_stop / is_punct / is_alpha / like_num
+    "tokens": ("tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"),
+    # part-of-speech tags and lemmas, no dependency parse or entities
+    "pos":    ("parser", "ner"),
+    # dependency parse, e.g. for noun_chunks
+    "parse":  ("ner",),
+    "full":   (),
+}
+
+
+def get_nlp():
+    return registry.get("en_core_web_sm")
+
+
+def _disabled(nlp, profile):
+    try:
+        wanted = PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown spaCy profile '{profile}', expected one of {list(PROFILES)}")
+    return [name for name in wanted if name in nlp.pipe_names]
+
+
+def parse_many(texts, profile="full", batch_size=None, n_process=None):
+    """Run every text through the shared pipeline in one `nlp.pipe` call."""
+    texts = [t or "" for t in texts]
+    if not texts:
+        return []
+    nlp = get_nlp()
+    return list(nlp.pipe(
+        texts,
+        disable=_disabled(nlp, profile),
+        batch_size=batch_size or SPACY_BATCH_SIZE,
+        n_process=n_process or SPACY_N_PROCESS,
+    ))
+
+
+def parse(text, profile="full"):
+    return parse_many([text], profile=profile, n_process=1)[0]
+
+
+def split_text(text, max_chars=SPACY_CHUNK_CHARS):
+    """Cut a long text into pieces of at most max_chars, at whitespace where possible."""
+    chunks = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text:
+        chunks.append(text)
+    return chunks
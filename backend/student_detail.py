@@ -1,15 +1,6 @@
-import sqlite3
 import json
-from flask import Blueprint, jsonify, current_app, g, abort
-
-def get_db():
-    if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config.get('DATABASE', 'quizzes.db'),
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
-    return g.db
+from flask import Blueprint, jsonify, abort
+from db import get_db
 
 student_detail_bp = Blueprint('student_detail', __name__)
 
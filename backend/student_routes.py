@@ -1,77 +1,14 @@
 import sqlite3, json
-from flask import request, jsonify, current_app, g, abort
-def get_db():
-    if "db" not in g:
-        db_path = current_app.config.get("DATABASE", "quizzes.db")
-        conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-        conn.row_factory = sqlite3.Row
-        g.db = conn
-    return g.db
-
-def get_quiz(quiz_id):
-    db = get_db()
-    row = db.execute(
-        "SELECT title, topic, data FROM quizzes WHERE id = ?",
-        (quiz_id,)
-    ).fetchone()
-
-    if not row:
-        abort(404, description="Quiz not found")
-    
-    try:
-        qlist = json.loads(row['data'])
-    except Exception:
-        abort(500, description="Malformed quiz data")
-
-    return {
-        "id":        quiz_id,
-        "title":     row['title'],
-        "topic":     row['topic'],
-        "questions": qlist  
-    }
-def close_db(e=None):
-    db = g.pop("db", None)
-    if db is not None:
-        db.close()
+from flask import request, jsonify, abort
+from db import get_db, init_app, request_transaction
+from migrations import migrate
+from grading import grade_submission
+from queries import CLASS_PERFORMANCE, CLASS_STUDENTS, STUDENT_QUIZZES
 
 def register_student_routes(app):
-    app.teardown_appcontext(close_db)
-
-    db_path = app.config.get("DATABASE", "quizzes.db")
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS classes(
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL, 
-            teacher_id TEXT
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS students(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            name TEXT,
-            surname TEXT,
-            email TEXT,
-            class_id TEXT,  -- nullable, no DEFAULT
-            role TEXT DEFAULT 'student',
-            password TEXT
-        )
-    """)
-    c.execute("""
-      CREATE TABLE IF NOT EXISTS teachers(
-        teacher_id TEXT PRIMARY KEY,
-        name       TEXT,
-        surname    TEXT,
-        email      TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
-        password TEXT
-      )
-    """) 
-    conn.commit()
-    conn.close()
+    init_app(app)
+
+    migrate(app.config.get("DATABASE"))
     # -------------------------------------------------------
 
     @app.route("/api/auth/login", methods=["POST"])
@@ -112,21 +49,20 @@ def register_student_routes(app):
         password = data.get("password") 
         if not all([sid, name, surname, email, password]):
             return jsonify({"error": "Missing fields"}), 400
-        db = get_db()
-        db.execute(
-            """
-            INSERT INTO students(student_id,name,surname,email,class_id, password)
-            VALUES(?,?,?,?,?,?)
-            ON CONFLICT(student_id) DO UPDATE SET
-              name=excluded.name,
-              surname=excluded.surname,
-              email=excluded.email,
-              class_id=excluded.class_id,
-              password=excluded.password
-            """,
-            (sid, name, surname, email, class_id, password),
-        )
-        db.commit()
+        with request_transaction() as db:
+            db.execute(
+                """
+                INSERT INTO students(student_id,name,surname,email,class_id, password)
+                VALUES(?,?,?,?,?,?)
+                ON CONFLICT(student_id) DO UPDATE SET
+                  name=excluded.name,
+                  surname=excluded.surname,
+                  email=excluded.email,
+                  class_id=excluded.class_id,
+                  password=excluded.password
+                """,
+                (sid, name, surname, email, class_id, password),
+            )
         row = db.execute(
             "SELECT student_id AS student_id, name, surname, email, class_id, role FROM students WHERE student_id=?",
             (sid,),
@@ -146,21 +82,20 @@ def register_student_routes(app):
 
         if not all([tid, name, surname, email, password]):
             return jsonify({"error": "Missing fields"}), 400
-        db = get_db()
-        db.execute(
-            """
-            INSERT INTO teachers(teacher_id,name,surname,email, password)
-            VALUES(?,?,?,?,?)
-            ON CONFLICT(teacher_id) DO UPDATE SET
-              name=excluded.name,
-              surname=excluded.surname,
-              email=excluded.email,
-              password=excluded.password
-
-            """,
-            (tid, name, surname, email, password),
-        )
-        db.commit()
+        with request_transaction() as db:
+            db.execute(
+                """
+                INSERT INTO teachers(teacher_id,name,surname,email, password)
+                VALUES(?,?,?,?,?)
+                ON CONFLICT(teacher_id) DO UPDATE SET
+                  name=excluded.name,
+                  surname=excluded.surname,
+                  email=excluded.email,
+                  password=excluded.password
+
+                """,
+                (tid, name, surname, email, password),
+            )
         row = db.execute(
             "SELECT teacher_id AS username, name, surname, email FROM teachers WHERE teacher_id=?",
             (tid,),
@@ -182,10 +117,9 @@ def register_student_routes(app):
         name = data.get("name")
         if not cid or not name:
             return jsonify({"error": "Missing id or name"}), 400
-        db = get_db()
         try:
-            db.execute("INSERT INTO classes(id,name) VALUES(?,?)", (cid, name))
-            db.commit()
+            with request_transaction() as db:
+                db.execute("INSERT INTO classes(id,name) VALUES(?,?)", (cid, name))
         except sqlite3.IntegrityError:
             return jsonify({"error": "Class already exists"}), 400
         return jsonify({"id": cid, "name": name}), 201
@@ -193,10 +127,7 @@ def register_student_routes(app):
     @app.route("/api/classes/<class_id>/students", methods=["GET"])
     def get_students_by_class(class_id):
         db = get_db()
-        rows = db.execute(
-            "SELECT student_id,name,surname,email,class_id FROM students WHERE class_id=?",
-            (class_id,),
-        ).fetchall()
+        rows = db.execute(CLASS_STUDENTS, (class_id,)).fetchall()
         return jsonify([dict(r) for r in rows])
 
     # ←––– THIS IS THE FIX: return the full student record, not just “exists”
@@ -214,25 +145,7 @@ def register_student_routes(app):
     @app.route("/api/student/<student_id>/quizzes", methods=["GET"])
     def list_quizzes_for_student(student_id):
         db = get_db()
-        rows = db.execute(
-            """
-            SELECT
-              q.id           AS quiz_id,
-              q.title        AS title,
-              q.topic        AS topic,
-              a.assigned_at  AS assigned_at,
-              a.due_at       AS due_at,
-              a.status       AS status,
-              a.score        AS score,
-              a.submitted_at AS submitted_at,
-              a.id           AS assignment_id
-            FROM quizzes q
-            JOIN assignments a ON a.quiz_id = q.id
-            WHERE a.student_id = ?
-            ORDER BY a.assigned_at DESC
-            """,
-            (student_id,),
-        ).fetchall()
+        rows = db.execute(STUDENT_QUIZZES, (student_id,)).fetchall()
         return jsonify([dict(r) for r in rows])
 
     @app.route("/api/student/<student_id>/submit", methods=["POST"])
@@ -242,41 +155,23 @@ def register_student_routes(app):
         assignment_id = data.get("assignment_id")
         student_ans   = data.get("answers", {})
 
-        quiz_obj = get_quiz(quiz_id)
-
-        correct = 0
-        total = len(quiz_obj["questions"])
-
-        for idx, item in enumerate(quiz_obj["questions"]):
-            if isinstance(item, (list, tuple)) and len(item) >= 2:
-                real = item[1]
-            elif isinstance(item, dict):
-                real = item.get("answer", "")
-            else:
-                real = ""
-
-            real_str = str(real).strip().lower()
-            given = str(student_ans.get(str(idx), "")).strip().lower()
-
-            print(f"[DEBUG] Q{idx} | Given: '{given}' | Expected: '{real_str}'")
-
-            if given == real_str:
-                correct += 1
-        score = round((correct / total) * 100) if total else 0
-
-        db = get_db()
-        db.execute(
-            """
-            UPDATE assignments
-            SET status='completed',
-                score=?,
-                submitted_at=CURRENT_TIMESTAMP,
-                answers=?
-            WHERE id=? AND student_id=?
-            """,
-            (score,json.dumps(student_ans),assignment_id, student_id),
-        )
-        db.commit()
+        result = grade_submission(quiz_id, student_ans)
+        if result is None:
+            abort(404, description="Quiz not found")
+        correct, total, score = result["correct"], result["total"], result["score"]
+
+        with request_transaction() as db:
+            db.execute(
+                """
+                UPDATE assignments
+                SET status='completed',
+                    score=?,
+                    submitted_at=CURRENT_TIMESTAMP,
+                    answers=?
+                WHERE id=? AND student_id=?
+                """,
+                (score,json.dumps(student_ans),assignment_id, student_id),
+            )
 
         return jsonify({
         "score": score,
@@ -431,14 +326,13 @@ def register_student_routes(app):
         class_name = data.get("name")
         if not class_name:
             return jsonify({"error": "Missing class name"}), 400
-        db = get_db()
         # Allow duplicate class names per teacher
         c_id = f"{class_name}".replace(" ", "_")
-        db.execute(
-            "INSERT INTO classes(id, name, teacher_id) VALUES (?, ?, ?)",
-            (c_id, class_name, teacher_id),
-        )
-        db.commit()
+        with request_transaction() as db:
+            db.execute(
+                "INSERT INTO classes(id, name, teacher_id) VALUES (?, ?, ?)",
+                (c_id, class_name, teacher_id),
+            )
         return jsonify({"id": c_id, "name": class_name, "teacher_id": teacher_id}), 201
     @app.route("/api/teacher/<teacher_id>/classes", methods=["GET"])
     def get_teacher_classes(teacher_id):
@@ -454,20 +348,20 @@ def register_student_routes(app):
         student_id = data.get("student_id")
         if not student_id:
             return jsonify({"error": "Missing student_id"}), 400
-        db = get_db()
-        # Only allow adding students with no class
-        row = db.execute(
-            "SELECT class_id FROM students WHERE student_id=?", (student_id,)
-        ).fetchone()
-        if not row:
-            return jsonify({"error": "Student not found"}), 404
-        if row["class_id"]:
-            return jsonify({"error": "Student already in a class"}), 400
-        db.execute(
-            "UPDATE students SET class_id=? WHERE student_id=?",
-            (class_id, student_id),
-        )
-        db.commit()
+        # Only allow adding students with no class; the write lock is taken
+        # before the check so two requests cannot both see the student free
+        with request_transaction(immediate=True) as db:
+            row = db.execute(
+                "SELECT class_id FROM students WHERE student_id=?", (student_id,)
+            ).fetchone()
+            if not row:
+                return jsonify({"error": "Student not found"}), 404
+            if row["class_id"]:
+                return jsonify({"error": "Student already in a class"}), 400
+            db.execute(
+                "UPDATE students SET class_id=? WHERE student_id=?",
+                (class_id, student_id),
+            )
         return jsonify({"status": "added"}), 200
     @app.route("/api/classes/<class_id>/remove_student", methods=["POST"])
     def remove_student_from_class(class_id):
@@ -475,19 +369,18 @@ def register_student_routes(app):
         student_id = data.get("student_id")
         if not student_id:
             return jsonify({"error": "Missing student_id"}), 400
-        db = get_db()
-        db.execute(
-            "UPDATE students SET class_id=NULL WHERE student_id=? AND class_id=?",
-            (student_id, class_id),
-        )
-        db.commit()
+        with request_transaction() as db:
+            db.execute(
+                "UPDATE students SET class_id=NULL WHERE student_id=? AND class_id=?",
+                (student_id, class_id),
+            )
         return jsonify({"status": "removed"}), 200
     @app.route("/api/classes/<class_id>", methods=["DELETE"])
     def delete_class(class_id):
-        db = get_db()
-        db.execute("UPDATE students SET class_id=NULL WHERE class_id=?", (class_id,))
-        db.execute("DELETE FROM classes WHERE id=?", (class_id,))
-        db.commit()
+        # unassign the students and drop the class together, or not at all
+        with request_transaction() as db:
+            db.execute("UPDATE students SET class_id=NULL WHERE class_id=?", (class_id,))
+            db.execute("DELETE FROM classes WHERE id=?", (class_id,))
         return jsonify({"status": "deleted"}), 200
     @app.route("/api/students/no_class", methods=["GET"])
     def get_students_no_class():
@@ -507,15 +400,7 @@ def register_student_routes(app):
     @app.route("/api/classes/<class_id>/performance", methods=["GET"])
     def class_performance(class_id):
         db = get_db()
-        rows = db.execute(
-            """
-            SELECT a.status, a.due_at, a.submitted_at
-            FROM assignments a
-            JOIN students s ON s.student_id = a.student_id
-            WHERE s.class_id = ?
-            """,
-            (class_id,)
-        ).fetchall()
+        rows = db.execute(CLASS_PERFORMANCE, (class_id,)).fetchall()
 
         # Build quiz-like objects
         quizzes = []
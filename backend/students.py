@@ -1,14 +1,5 @@
-import sqlite3
-from flask import Blueprint, jsonify, current_app, g
-
-def get_db():
-    if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config.get('DATABASE', 'quizzes.db'),
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
-    return g.db
+from flask import Blueprint, jsonify
+from db import get_db
 
 students_bp = Blueprint('students', __name__)
 
@@ -1,14 +1,41 @@
-from transformers import pipeline, AutoModelForSeq2SeqLM, AutoTokenizer
+"""
+The one summarization service, used by /api/summarize and by every
+`with_summary` option of the quiz generation routes.
+
+Long documents are summarized hierarchically: the text is split into
+sentence-aligned chunks that fit the model's input window, the chunks are
+summarized in batches, and the joined chunk summaries are summarized again
+(repeating while they still do not fit) into the final summary. Every chunk
+reports its token counts and its share of the batch time.
+
+SUMMARY_MODEL picks the default model: bart-large-cnn (default) or the
+flan-t5-base checkpoint already loaded for question generation, which can
+also be asked for per call. `summarize_head` keeps the original
+/api/summarize behavior: one pass over the first SUMMARY_HEAD_CHARS
+characters.
+"""
+import os
 import re
-model_name = "facebook/bart-large-cnn"
-model     = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-max_len = model.config.max_position_embeddings  
-summarizer = pipeline(
-  "summarization",
-  model=model,
-  tokenizer=tokenizer,
-)
+import time
+
+import torch
+from model_registry import registry, SUMMARY_MODEL
+from nlp_cache import cache
+
+SUMMARY_CHUNK_TOKENS  = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "480"))
+SUMMARY_CHUNK_SUMMARY = int(os.environ.get("SUMMARY_CHUNK_SUMMARY", "120"))
+SUMMARY_BATCH_SIZE    = int(os.environ.get("SUMMARY_BATCH_SIZE", "4"))
+SUMMARY_NUM_BEAMS     = int(os.environ.get("SUMMARY_NUM_BEAMS", "2"))
+SUMMARY_MAX_LEVELS    = int(os.environ.get("SUMMARY_MAX_LEVELS", "3"))
+SUMMARY_HEAD_CHARS    = int(os.environ.get("SUMMARY_HEAD_CHARS", "1000"))
+
+MODEL_IDS = {
+    "flan-t5-base":   "google/flan-t5-base",
+    "bart-large-cnn": "facebook/bart-large-cnn",
+}
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
 def clean_summary(text: str) -> str:
     text = re.sub(r"http[s]?://\S+", "", text)
     text = re.sub(r"Back to .*?\.", "", text)
@@ -19,6 +46,172 @@ def clean_summary(text: str) -> str:
     limited = " ".join(sentences[:10])
     return limited.strip()
 
-def summarize_text(text):
-    truncated = text[:1000]   
-    return summarizer(truncated, max_length=300, min_length=80, do_sample=False)[0]["summary_text"]
+
+class SummarizationService:
+    def __init__(self, model_name=SUMMARY_MODEL):
+        self.model_name = model_name
+        self.model_id   = MODEL_IDS[model_name]
+        # T5 checkpoints are instruction-prompted; BART summarizes raw text
+        self.prefix     = "summarize: " if "t5" in model_name else ""
+
+    @property
+    def tokenizer(self):
+        return registry.get(self.model_name)[0]
+
+    @property
+    def model(self):
+        return registry.get(self.model_name)[1]
+
+    def _window(self):
+        limit = getattr(self.tokenizer, "model_max_length", None) or SUMMARY_CHUNK_TOKENS
+        prefix = len(self.tokenizer(self.prefix, add_special_tokens=False)["input_ids"])
+        return max(32, min(SUMMARY_CHUNK_TOKENS, limit - prefix - 8))
+
+    # ─── CHUNKING ────────────────────────────────────────────────────────────
+    def chunk(self, text, window=None):
+        """Split text into sentence-aligned pieces of at most `window` tokens."""
+        window = window or self._window()
+        sentences = [s for s in _SENTENCE_RE.split(text.strip()) if s]
+        if not sentences:
+            return []
+        ids = self.tokenizer(sentences, add_special_tokens=False)["input_ids"]
+
+        chunks, current, size = [], [], 0
+        for sentence, sent_ids in zip(sentences, ids):
+            if len(sent_ids) > window:
+                # a single over-long "sentence": cut it on token boundaries
+                if current:
+                    chunks.append(" ".join(current))
+                    current, size = [], 0
+                for start in range(0, len(sent_ids), window):
+                    chunks.append(self.tokenizer.decode(
+                        sent_ids[start : start + window], skip_special_tokens=True
+                    ))
+                continue
+            if size + len(sent_ids) > window and current:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+            current.append(sentence)
+            size += len(sent_ids)
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    # ─── GENERATION ──────────────────────────────────────────────────────────
+    def _generate(self, texts, max_length, min_length, level, num_beams=SUMMARY_NUM_BEAMS):
+        """
+        Summaries of `texts` in batches, plus one cost record per text.
+        num_beams=None decodes with the checkpoint's own generation settings.
+        """
+        search = {} if num_beams is None else {
+            "num_beams": num_beams, "no_repeat_ngram_size": 3, "early_stopping": True
+        }
+        tokenizer, model = self.tokenizer, self.model
+        summaries, costs = [], []
+        for start in range(0, len(texts), SUMMARY_BATCH_SIZE):
+            batch = [self.prefix + t for t in texts[start : start + SUMMARY_BATCH_SIZE]]
+            inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
+            inputs = {k: v.to(model.device) for k, v in inputs.items()}
+            t0 = time.perf_counter()
+            with torch.no_grad():
+                out_ids = model.generate(
+                    **inputs,
+                    max_length=max_length,
+                    min_length=min_length,
+                    **search
+                )
+            share = (time.perf_counter() - t0) / len(batch)
+
+            in_tokens = inputs["attention_mask"].sum(dim=1).tolist()
+            pad_id = tokenizer.pad_token_id
+            for i, row in enumerate(out_ids):
+                summaries.append(tokenizer.decode(row, skip_special_tokens=True).strip())
+                costs.append({
+                    "level":         level,
+                    "chunk":         start + i,
+                    "input_tokens":  int(in_tokens[i]),
+                    "output_tokens": int((row != pad_id).sum()) if pad_id is not None else len(row),
+                    "seconds":       round(share, 3),
+                })
+        return summaries, costs
+
+    def summarize(self, text, max_length=150, min_length=50):
+        """
+        Returns {"summary", "levels", "chunks", "cost", "seconds"}; `cost`
+        has one entry per summarized chunk at every level.
+        """
+        started = time.perf_counter()
+        window = self._window()
+        costs, level = [], 0
+        chunks = self.chunk(text, window)
+        n_chunks = len(chunks)
+        if not chunks:
+            return {"summary": "", "levels": 0, "chunks": 0, "cost": [], "seconds": 0.0}
+
+        # reduce: summarize chunks until the joined summaries fit one window
+        while len(chunks) > 1 and level < SUMMARY_MAX_LEVELS:
+            level += 1
+            partial, level_costs = self._generate(
+                chunks, SUMMARY_CHUNK_SUMMARY, min(min_length, SUMMARY_CHUNK_SUMMARY // 2), level
+            )
+            costs += level_costs
+            chunks = self.chunk(" ".join(partial), window)
+
+        level += 1
+        final, final_costs = self._generate(
+            [" ".join(chunks)], max_length, min_length, level
+        )
+        costs += final_costs
+        return {
+            "summary": final[0],
+            "levels":  level,
+            "chunks":  n_chunks,
+            "cost":    costs,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def summarize_head(self, text, max_length=300, min_length=80):
+        """Summary of the first SUMMARY_HEAD_CHARS characters, in one pass."""
+        head = text[:SUMMARY_HEAD_CHARS].strip()
+        if not head:
+            return ""
+        summaries, _ = self._generate([head], max_length, min_length, 1, num_beams=None)
+        return summaries[0]
+
+    def summarize_head_cached(self, text, max_length=300, min_length=80, refresh=False):
+        return cache.memoize(
+            "summarize.head", text,
+            lambda: self.summarize_head(text, max_length=max_length, min_length=min_length),
+            refresh=refresh,
+            model=self.model_id, max_length=max_length, min_length=min_length,
+            head_chars=SUMMARY_HEAD_CHARS
+        )
+
+    def summarize_cached(self, text, max_length=150, min_length=50, refresh=False):
+        return cache.memoize(
+            "summarize", text,
+            lambda: self.summarize(text, max_length=max_length, min_length=min_length),
+            refresh=refresh,
+            model=self.model_id, max_length=max_length, min_length=min_length,
+            chunk_tokens=SUMMARY_CHUNK_TOKENS, chunk_summary=SUMMARY_CHUNK_SUMMARY,
+            num_beams=SUMMARY_NUM_BEAMS
+        )
+
+
+summarization_service = SummarizationService()
+_services = {SUMMARY_MODEL: summarization_service}
+
+
+def get_summarization_service(model_name=None):
+    """The service for `model_name` (default SUMMARY_MODEL); ValueError if it is not available."""
+    model_name = model_name or SUMMARY_MODEL
+    if model_name not in MODEL_IDS or model_name not in registry.names():
+        available = [m for m in MODEL_IDS if m in registry.names()]
+        raise ValueError(f"Unknown summarization model '{model_name}', expected one of {available}")
+    if model_name not in _services:
+        _services[model_name] = SummarizationService(model_name)
+    return _services[model_name]
+
+
+def summarize_text(text, max_length=150, min_length=50):
+    return summarization_service.summarize_cached(text, max_length, min_length)["summary"]
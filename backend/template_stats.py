@@ -0,0 +1,109 @@
+# backend/template_stats.py
+"""
+Per-template outcome counters for template-driven question generation.
+
+Every QA answer produced from a question template ends up accepted or
+rejected as low-score, empty or duplicate. The counts are kept in a
+`template_stats` table in quizzes.db (and mirrored in memory) so that later
+runs can try high-yield templates first and stop sooner.
+"""
+import random
+import threading
+
+from db import DB_PATH, connection, transaction
+from migrations import migrate
+
+OUTCOMES = ("accepted", "low_score", "empty", "duplicate")
+
+# Beta(1, 1) prior: a template nobody has tried yet ranks like one with a
+# 50% yield, so new templates still get explored
+PRIOR_ACCEPTED = 1.0
+PRIOR_ATTEMPTS = 2.0
+
+
+class TemplateStats:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock   = threading.Lock()
+        self._counts = None
+
+    def init_table(self):
+        """The table is created by migration 7; make sure it has run."""
+        migrate(self.db_path)
+
+    def _ensure_loaded(self):
+        if self._counts is not None:
+            return
+        with self._lock:
+            if self._counts is not None:
+                return
+            self.init_table()
+            with connection(self.db_path) as conn:
+                rows = conn.execute(
+                    "SELECT template, attempts, " + ", ".join(OUTCOMES) + " FROM template_stats"
+                ).fetchall()
+            self._counts = {
+                row[0]: dict(zip(("attempts",) + OUTCOMES, row[1:])) for row in rows
+            }
+
+    def expected_yield(self, template):
+        self._ensure_loaded()
+        st = self._counts.get(template)
+        if not st:
+            return PRIOR_ACCEPTED / PRIOR_ATTEMPTS
+        return (st["accepted"] + PRIOR_ACCEPTED) / (st["attempts"] + PRIOR_ATTEMPTS)
+
+    def rank(self, templates, k=None):
+        """
+        Up to k templates ordered for trial: weighted sampling without
+        replacement (Efraimidis-Spirakis keys) by expected yield, so good
+        templates come first but the order still varies between runs.
+        """
+        keyed = [
+            (random.random() ** (1.0 / max(self.expected_yield(t), 1e-6)), t)
+            for t in templates
+        ]
+        keyed.sort(reverse=True)
+        ranked = [t for _, t in keyed]
+        return ranked if k is None else ranked[:k]
+
+    def record(self, outcomes):
+        """outcomes: {template: {outcome: count}} from one generation run."""
+        if not outcomes:
+            return
+        self._ensure_loaded()
+        rows = []
+        with self._lock:
+            for tpl, counts in outcomes.items():
+                st = self._counts.setdefault(tpl, dict.fromkeys(("attempts",) + OUTCOMES, 0))
+                for name in OUTCOMES:
+                    st[name] += counts.get(name, 0)
+                st["attempts"] += sum(counts.get(name, 0) for name in OUTCOMES)
+                rows.append((tpl, *(st[name] for name in ("attempts",) + OUTCOMES)))
+            with transaction(self.db_path) as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO template_stats "
+                    "(template, attempts, accepted, low_score, empty, duplicate, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                    rows
+                )
+
+    def summary(self, limit=None):
+        """Per-template counts and yield rates, best expected yield first."""
+        self._ensure_loaded()
+        with self._lock:
+            items = [(tpl, dict(st)) for tpl, st in self._counts.items()]
+        out = []
+        for tpl, st in items:
+            attempts = st["attempts"]
+            out.append({
+                "template":       tpl,
+                **st,
+                "yield":          round(st["accepted"] / attempts, 4) if attempts else None,
+                "expected_yield": round(self.expected_yield(tpl), 4),
+            })
+        out.sort(key=lambda r: r["expected_yield"], reverse=True)
+        return out if limit is None else out[:limit]
+
+
+template_stats = TemplateStats()
@@ -0,0 +1,179 @@
+# backend/term_stats.py
+"""
+Corpus-level document frequencies for key-phrase extraction.
+
+Every uploaded or generated-from document is counted once (by normalized
+content hash). Terms are hashed into a fixed number of buckets, the same
+way sklearn's HashingVectorizer does, so no vocabulary has to be stored:
+document frequencies live in a `term_df` table in quizzes.db and in a NumPy
+array in memory, both updated incrementally. Scoring a new document is a
+lookup into that array — no vectorizer is fitted per call.
+"""
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from sklearn.utils import murmurhash3_32
+
+from db import DB_PATH, connection, transaction
+from migrations import migrate
+from nlp_cache import text_hash
+
+N_FEATURES = 2 ** 18
+# documents waiting to be counted; submissions past this are dropped
+TERM_STATS_QUEUE_SIZE = int(os.environ.get("TERM_STATS_QUEUE_SIZE", "64"))
+
+
+def terms_from_doc(doc):
+    """Lower-cased content terms of a spaCy doc (tokenizer profile is enough)."""
+    terms = []
+    for token in doc:
+        if token.is_stop or token.is_punct or token.is_space:
+            continue
+        term = token.text.lower()
+        if len(term) < 2 or not any(c.isalnum() for c in term):
+            continue
+        if term in ENGLISH_STOP_WORDS:
+            continue
+        terms.append(term)
+    return terms
+
+
+def feature_of(term, n_features=N_FEATURES):
+    return murmurhash3_32(term, seed=0, positive=True) % n_features
+
+
+class TermStats:
+    def __init__(self, db_path=DB_PATH, n_features=N_FEATURES):
+        self.db_path    = db_path
+        self.n_features = n_features
+        self._lock      = threading.Lock()
+        self._df        = None
+        self._n_docs    = 0
+        self._executor  = ThreadPoolExecutor(max_workers=1, thread_name_prefix="term-stats")
+        self._pending   = set()     # hashes of queued documents
+        self._pending_lock = threading.Lock()
+
+    def init_tables(self):
+        """The tables are created by migration 8; make sure it has run."""
+        migrate(self.db_path)
+
+    def _ensure_loaded(self):
+        if self._df is not None:
+            return
+        with self._lock:
+            if self._df is not None:
+                return
+            self.init_tables()
+            df = np.zeros(self.n_features, dtype=np.int32)
+            with connection(self.db_path) as conn:
+                rows = conn.execute("SELECT feature, df FROM term_df").fetchall()
+                n_docs = conn.execute("SELECT COUNT(*) FROM term_docs").fetchone()[0]
+            if rows:
+                feats, counts = zip(*rows)
+                df[np.fromiter(feats, dtype=np.int64)] = counts
+            self._n_docs = n_docs
+            self._df = df
+
+    @property
+    def n_docs(self):
+        self._ensure_loaded()
+        return self._n_docs
+
+    # ─── UPDATES ─────────────────────────────────────────────────────────────
+    def add_terms(self, doc_hash, terms):
+        """Count one document's terms; a document already counted is ignored."""
+        self._ensure_loaded()
+        features = sorted({feature_of(t, self.n_features) for t in terms})
+        with self._lock:
+            with transaction(self.db_path) as conn:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO term_docs (doc_hash, n_terms) VALUES (?, ?)",
+                    (doc_hash, len(terms))
+                )
+                if cur.rowcount == 0:
+                    return False
+                conn.executemany(
+                    "INSERT INTO term_df (feature, df) VALUES (?, 1) "
+                    "ON CONFLICT(feature) DO UPDATE SET df = df + 1",
+                    [(f,) for f in features]
+                )
+            if features:
+                self._df[np.asarray(features, dtype=np.int64)] += 1
+            self._n_docs += 1
+            return True
+
+    def has_document(self, doc_hash):
+        self._ensure_loaded()
+        with connection(self.db_path) as conn:
+            return conn.execute(
+                "SELECT 1 FROM term_docs WHERE doc_hash = ?", (doc_hash,)
+            ).fetchone() is not None
+
+    def add_document(self, text, doc_hash=None):
+        from spacy_service import parse_many, split_text
+        if not text or not text.strip():
+            return False
+        # the same text comes back on every generation; skip the parse
+        doc_hash = doc_hash or text_hash(text)
+        if self.has_document(doc_hash):
+            return False
+        # uploads can exceed spaCy's max_length, so parse them in chunks
+        docs = parse_many(split_text(text), profile="tokens")
+        return self.add_terms(doc_hash, [t for doc in docs for t in terms_from_doc(doc)])
+
+    def add_document_async(self, text):
+        """
+        Queue a document for counting without holding up the request.
+        Returns False when it was dropped: already counted or queued, or
+        the queue is full.
+        """
+        if not text or not text.strip():
+            return False
+        doc_hash = text_hash(text)
+        with self._pending_lock:
+            if doc_hash in self._pending:
+                return False
+            if len(self._pending) >= TERM_STATS_QUEUE_SIZE:
+                print(f"[WARN] Term statistics queue full; document {doc_hash[:12]} not counted")
+                return False
+            self._pending.add(doc_hash)
+
+        def _run():
+            try:
+                self.add_document(text, doc_hash)
+            except Exception as e:
+                print(f"[WARN] Could not update term statistics: {e}")
+            finally:
+                with self._pending_lock:
+                    self._pending.discard(doc_hash)
+        self._executor.submit(_run)
+        return True
+
+    # ─── SCORING ─────────────────────────────────────────────────────────────
+    def idf(self, terms):
+        """Smoothed idf, as TfidfVectorizer computes it: ln((1+N)/(1+df)) + 1."""
+        self._ensure_loaded()
+        features = np.fromiter(
+            (feature_of(t, self.n_features) for t in terms), dtype=np.int64, count=len(terms)
+        )
+        df = self._df[features].astype(np.float64)
+        return np.log((1.0 + self._n_docs) / (1.0 + df)) + 1.0
+
+    def top_terms(self, terms, top_n=10):
+        """Rank a document's terms by tf * corpus idf."""
+        tf = Counter(terms)
+        if not tf:
+            return []
+        vocab = list(tf)
+        weights = np.fromiter((tf[t] for t in vocab), dtype=np.float64, count=len(vocab))
+        weights *= self.idf(vocab)
+        # stable sort keeps first-seen order among equal scores
+        order = np.argsort(-weights, kind="stable")[:top_n]
+        return [vocab[i] for i in order]
+
+
+term_stats = TermStats()
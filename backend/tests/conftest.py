@@ -0,0 +1,29 @@
+# backend/tests/conftest.py
+"""
+Shared fixtures. The backend is a flat set of modules, so the backend
+directory goes on sys.path; every test gets its own migrated quizzes.db.
+None of these tests load an NLP model.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import answer_key  # noqa: E402
+import db          # noqa: E402
+import migrations  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A fresh, fully migrated database that the default pool points at."""
+    path = str(tmp_path / "quizzes.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    monkeypatch.setattr(migrations, "DB_PATH", path)
+    # compiled keys are cached by quiz id, which restarts at 1 in every database
+    answer_key._cache.clear()
+    migrations.migrate(path)
+    yield path
+    db.get_pool(path).close_all()
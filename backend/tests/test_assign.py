@@ -0,0 +1,58 @@
+import pytest
+
+from db import connection, transaction
+from quiz_model import assign_quiz_to_student, assign_quizzes, save_quiz
+
+
+@pytest.fixture
+def quiz_id(db_path):
+    with transaction() as conn:
+        conn.execute("INSERT INTO classes (id, name) VALUES ('c1', 'Class 1')")
+        conn.executemany(
+            "INSERT INTO students (student_id, class_id) VALUES (?, ?)",
+            [("1", "c1"), ("2", "c1"), ("3", None)]
+        )
+    return save_quiz("Cells", "biology", [["What is the powerhouse?", "Mitochondria"]], "ABC123")
+
+
+def assignees(quiz_id):
+    with connection() as conn:
+        return sorted(r[0] for r in conn.execute(
+            "SELECT student_id FROM assignments WHERE quiz_id = ?", (quiz_id,)
+        ))
+
+
+def test_assigns_class_roster_and_extra_students(quiz_id):
+    counts = assign_quizzes([quiz_id], class_ids=["c1"], student_ids=["3"], due_at="2030-01-01")
+    assert counts["assigned"] == 3
+    assert counts["already_assigned"] == 0
+    assert assignees(quiz_id) == ["1", "2", "3"]
+
+
+def test_repeat_assignment_is_skipped(quiz_id):
+    assign_quizzes([quiz_id], class_ids=["c1"])
+    counts = assign_quizzes([quiz_id], class_ids=["c1", "c1"], student_ids=["1"])
+    assert counts["assigned"] == 0
+    assert counts["already_assigned"] == 2
+    assert assignees(quiz_id) == ["1", "2"]
+
+
+def test_numeric_student_ids_match_stored_text_ids(quiz_id):
+    assert assign_quizzes([quiz_id], student_ids=[1, "1", 3])["assigned"] == 2
+    assert assign_quizzes([quiz_id], student_ids=[1, 3])["already_assigned"] == 2
+    assert assignees(quiz_id) == ["1", "3"]
+
+
+def test_missing_quizzes_and_empty_classes_are_reported(quiz_id):
+    counts = assign_quizzes([quiz_id, 999], class_ids=["nobody"], student_ids=["3"])
+    assert counts["quizzes"] == 1
+    assert counts["missing_quizzes"] == [999]
+    assert counts["empty_classes"] == ["nobody"]
+    assert counts["assigned"] == 1
+    assert assignees(999) == []
+
+
+def test_assign_quiz_to_student_reports_new_rows(quiz_id):
+    assert assign_quiz_to_student(quiz_id, "3") is True
+    assert assign_quiz_to_student(quiz_id, "3") is False
+    assert assignees(quiz_id) == ["3"]
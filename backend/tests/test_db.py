@@ -0,0 +1,86 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db import connection, get_pool, transaction
+
+
+@pytest.fixture
+def table(db_path):
+    with transaction() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER UNIQUE)")
+    return db_path
+
+
+def values():
+    with connection() as conn:
+        return [r[0] for r in conn.execute("SELECT x FROM t ORDER BY x")]
+
+
+def test_transaction_commits_on_success(table):
+    with transaction() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.execute("INSERT INTO t VALUES (2)")
+    assert values() == [1, 2]
+
+
+def test_transaction_rolls_back_on_error(table):
+    with pytest.raises(sqlite3.IntegrityError):
+        with transaction() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            conn.execute("INSERT INTO t VALUES (1)")
+    assert values() == []
+
+
+def test_nested_transaction_is_a_savepoint(table):
+    with transaction() as outer:
+        outer.execute("INSERT INTO t VALUES (1)")
+        with pytest.raises(sqlite3.IntegrityError):
+            with transaction() as inner:
+                assert inner is outer
+                inner.execute("INSERT INTO t VALUES (2)")
+                inner.execute("INSERT INTO t VALUES (1)")
+        with transaction() as inner:
+            inner.execute("INSERT INTO t VALUES (3)")
+        # nothing is visible to other connections before the outer commit
+        other = sqlite3.connect(table)
+        assert other.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        other.close()
+    assert values() == [1, 3]
+
+
+def test_outer_rollback_discards_released_savepoints(table):
+    with pytest.raises(RuntimeError):
+        with transaction() as conn:
+            with transaction() as inner:
+                inner.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+    assert values() == []
+
+
+def test_connection_is_reused_within_a_thread(table):
+    with connection() as a:
+        with connection() as b:
+            assert a is b
+    with connection() as c:
+        pass
+    assert c is a
+    assert get_pool().stats()["opened"] == 1
+
+
+def test_threads_get_their_own_connection(table):
+    seen = []
+    barrier = threading.Barrier(2)
+
+    def work():
+        with connection() as conn:
+            seen.append(id(conn))
+            barrier.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(seen)) == 2
@@ -0,0 +1,106 @@
+import json
+import time
+
+import pytest
+
+import generation_jobs as jobs
+from db import connection, transaction
+
+
+class Executor:
+    """Records submitted jobs instead of running them."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, job_id):
+        self.submitted.append(job_id)
+
+
+@pytest.fixture
+def executor(db_path, monkeypatch):
+    executor = Executor()
+    monkeypatch.setattr(jobs, "_get_executor", lambda: executor)
+    return executor
+
+
+def add_job(job_id, status="queued", owner=None, heartbeat_at=None):
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO generation_jobs (id, status, params, timings, owner, heartbeat_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, status, json.dumps({"topic": "cells"}),
+             json.dumps({"enqueued": time.time()}), owner, heartbeat_at)
+        )
+
+
+def row(job_id):
+    with connection() as conn:
+        return dict(conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def test_submit_job_queues_and_hands_off(executor):
+    job_id = jobs.submit_job({"topic": "cells"})
+    assert executor.submitted == [job_id]
+    assert jobs.get_job(job_id)["status"] == "queued"
+
+
+def test_submit_job_respects_the_queue_limit(executor, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_QUEUE_LIMIT", 1)
+    jobs.submit_job({})
+    with pytest.raises(jobs.JobQueueFull):
+        jobs.submit_job({})
+    assert len(executor.submitted) == 1
+
+
+def test_a_job_is_claimed_only_once(executor):
+    add_job("j1")
+    claimed = jobs._claim("j1", time.time())
+    assert json.loads(claimed["params"]) == {"topic": "cells"}
+    assert jobs._claim("j1", time.time()) is None
+
+    job = row("j1")
+    assert job["status"] == "running"
+    assert job["owner"] == jobs.WORKER_ID
+    assert job["heartbeat_at"] is not None
+
+
+def test_job_cancelled_before_start_is_not_claimed(executor):
+    add_job("j1")
+    assert jobs.cancel_job("j1") == "cancelled"
+    assert jobs._claim("j1", time.time()) is None
+    assert row("j1")["status"] == "cancelled"
+    assert jobs.cancel_job("missing") is None
+
+
+def test_cancelling_a_running_job_flags_it(executor):
+    add_job("j1")
+    jobs._claim("j1", time.time())
+    assert jobs.cancel_job("j1") == "running"
+    assert jobs._cancel_requested("j1")
+
+
+def test_updates_require_ownership(executor):
+    add_job("j1", status="running", owner="other-worker", heartbeat_at=time.time())
+    assert jobs._update("j1", progress=0.5) is False
+    assert row("j1")["progress"] == 0
+
+
+def test_resume_requeues_only_stale_running_jobs(executor):
+    now = time.time()
+    add_job("queued")
+    add_job("stale", status="running", owner="dead-worker",
+            heartbeat_at=now - jobs.JOB_STALE_SECONDS - 1)
+    add_job("orphan", status="running", owner="old-worker")
+    add_job("live", status="running", owner="live-worker", heartbeat_at=now)
+    add_job("done", status="completed")
+
+    assert jobs.resume_pending_jobs() == 3
+    assert sorted(executor.submitted) == ["orphan", "queued", "stale"]
+
+    stale = row("stale")
+    assert stale["status"] == "queued"
+    assert stale["owner"] is None and stale["heartbeat_at"] is None
+    live = row("live")
+    assert live["status"] == "running" and live["owner"] == "live-worker"
+    assert row("done")["status"] == "completed"
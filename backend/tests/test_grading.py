@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pytest
+
+import grading
+from answer_key import get_answer_key
+from db import connection, transaction
+from quiz_model import save_quiz
+
+QUESTIONS = [
+    ["What is the powerhouse of the cell?", "the mitochondria"],
+    {"question": "Which organelle holds DNA?", "answer": "Nucleus",
+     "options": ["Nucleus", "Ribosome"]},
+    ["What do plants make with light?", "glucose and oxygen"],
+]
+
+
+@pytest.fixture
+def quiz_id(db_path):
+    return save_quiz("Cells", "biology", QUESTIONS, "ABC123")
+
+
+def test_token_overlap():
+    assert grading.token_overlap("glucose and oxygen", "glucose and oxygen") == 1.0
+    assert grading.token_overlap("oxygen and glucose", "glucose and oxygen") == 1.0
+    assert grading.token_overlap("glucose", "glucose and oxygen") == 0.5
+    assert grading.token_overlap("", "glucose") == 0.0
+
+
+def test_exact_mode_needs_the_normalized_answer(quiz_id):
+    result = grading.grade_submission(quiz_id, {
+        "0": "  The Mitochondria ", "1": "nucleus", "2": "oxygen and glucose",
+    })
+    assert result == {"correct": 2, "total": 3, "score": 67, "mode": "exact"}
+
+
+def test_fuzzy_mode_accepts_reordered_open_answers(quiz_id):
+    grading.set_settings(quiz_id, mode="fuzzy")
+    key = get_answer_key(quiz_id)
+    settings = grading.get_settings(quiz_id)
+    correct = grading.grade_many(key, [
+        {"0": "mitochondria the", "1": "nucleus", "2": "oxygen and glucose"},
+        {"0": "mitochondria", "1": "Nucleus", "2": "glucose"},
+        {},
+    ], settings)
+    # "mitochondria" alone overlaps 2/3 and "glucose" 1/2: both under 0.8
+    assert correct == [3, 1, 0]
+
+
+def test_fuzzy_mode_never_relaxes_multiple_choice(quiz_id):
+    grading.set_settings(quiz_id, mode="fuzzy", overlap_threshold=0.0)
+    key = get_answer_key(quiz_id)
+    assert grading.grade_many(key, [{"1": "nucleus ribosome"}], grading.get_settings(quiz_id)) == [0]
+
+
+def test_fuzzy_threshold_is_per_quiz(quiz_id):
+    grading.set_settings(quiz_id, mode="fuzzy", overlap_threshold=0.5)
+    result = grading.grade_submission(quiz_id, {"2": "glucose"})
+    assert result["correct"] == 1
+    assert grading.get_settings(quiz_id + 1)["mode"] == grading.GRADING_MODE
+
+
+def test_invalid_settings_are_rejected(quiz_id):
+    with pytest.raises(ValueError):
+        grading.set_settings(quiz_id, mode="lenient")
+    with pytest.raises(ValueError):
+        grading.set_settings(quiz_id, overlap_threshold=1.5)
+
+
+def test_semantic_mode_uses_embeddings(quiz_id, monkeypatch):
+    vectors = {
+        "the mitochondria":     [1.0, 0.0],
+        "powerhouse organelle": [0.9, np.sqrt(1 - 0.81)],
+        "glucose and oxygen":   [0.0, 1.0],
+        "sunlight":             [1.0, 0.0],
+    }
+    monkeypatch.setattr(grading, "encode_texts",
+                        lambda texts: np.array([vectors[t] for t in texts]))
+    grading.set_settings(quiz_id, mode="semantic", semantic_threshold=0.85)
+    result = grading.grade_submission(quiz_id, {"0": "powerhouse organelle", "2": "sunlight"})
+    assert result["correct"] == 1
+
+
+def test_semantic_mode_falls_back_to_fuzzy_without_embeddings(quiz_id, monkeypatch):
+    def unavailable(texts):
+        raise RuntimeError("no model")
+    monkeypatch.setattr(grading, "encode_texts", unavailable)
+    grading.set_settings(quiz_id, mode="semantic")
+    result = grading.grade_submission(quiz_id, {"0": "mitochondria the", "2": "sunlight"})
+    assert result["correct"] == 1
+
+
+def test_regrade_applies_new_settings(quiz_id):
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO assignments (quiz_id, student_id, status, score, answers) "
+            "VALUES (?, 's1', 'completed', 33, ?)",
+            (quiz_id, json.dumps({"0": "the mitochondria", "2": "oxygen and glucose"}))
+        )
+    grading.set_settings(quiz_id, mode="fuzzy")
+    report = grading.regrade_quiz(quiz_id)
+    assert report["quiz_id"] == quiz_id
+    assert grading.regrade_quiz(999) is None
+    with connection() as conn:
+        assert conn.execute("SELECT score FROM assignments").fetchone()[0] == 67
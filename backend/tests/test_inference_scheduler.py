@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from inference_scheduler import MicroBatcher
+
+
+class Model:
+    """Upper-cases its inputs and records every batch; `hold` blocks the next batch."""
+
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+        self.hold = None
+
+    def __call__(self, items):
+        if self.hold is not None:
+            hold, self.hold = self.hold, None
+            hold.wait(5)
+        self.batches.append(list(items))
+        self.threads.add(threading.current_thread().name)
+        if "bad" in items:
+            raise ValueError("bad input")
+        return [item.upper() for item in items]
+
+
+def submit_in_threads(batcher, requests):
+    results, errors = {}, {}
+
+    def call(i, items):
+        try:
+            results[i] = batcher.submit(items)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, r)) for i, r in enumerate(requests)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def wait_for_queue(batcher, requests):
+    deadline = time.time() + 5
+    while batcher.stats()["queued_requests"] < requests:
+        assert time.time() < deadline, "requests never reached the queue"
+        time.sleep(0.005)
+
+
+def blocked_batcher(model, **kwargs):
+    """A batcher whose worker is busy on a first request until `release` is set."""
+    batcher = MicroBatcher("test", model, enabled=True, **kwargs)
+    release = threading.Event()
+    model.hold = release
+    # max_items=1: the first request is a full batch and runs at once
+    first = threading.Thread(target=batcher.submit, args=(["first"],), kwargs={"max_items": 1})
+    first.start()
+    deadline = time.time() + 5
+    while model.hold is not None:
+        assert time.time() < deadline
+        time.sleep(0.005)
+    return batcher, release, first
+
+
+def test_full_batch_flushes_without_waiting():
+    model = Model()
+    batcher = MicroBatcher("test", model, max_items=4, max_wait_ms=10_000, enabled=True)
+    started = time.perf_counter()
+    assert batcher.submit(["a", "b", "c", "d"]) == ["A", "B", "C", "D"]
+    assert time.perf_counter() - started < 5
+    assert model.batches == [["a", "b", "c", "d"]]
+    batcher.stop()
+
+
+def test_partial_batch_flushes_on_timeout():
+    model = Model()
+    batcher = MicroBatcher("test", model, max_items=100, max_wait_ms=20, enabled=True)
+    assert batcher.submit(["a", "b"]) == ["A", "B"]
+    assert model.batches == [["a", "b"]]
+    batcher.stop()
+
+
+def test_concurrent_requests_share_a_batch():
+    model = Model()
+    batcher, release, first = blocked_batcher(model, max_items=3, max_wait_ms=10_000)
+    threads, results, errors = submit_in_threads(batcher, [["a"], ["b"], ["c"]])
+    wait_for_queue(batcher, 3)
+    release.set()
+    for t in threads + [first]:
+        t.join(5)
+
+    assert not errors
+    assert results == {0: ["A"], 1: ["B"], 2: ["C"]}
+    assert sorted(model.batches[1]) == ["a", "b", "c"]
+    # the worker updates its stats just after answering the callers
+    deadline = time.time() + 5
+    while batcher.stats()["batches"] < 2 and time.time() < deadline:
+        time.sleep(0.005)
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["requests"] == 4 and stats["max_batch_size"] == 3
+    batcher.stop()
+
+
+def test_max_items_hint_caps_every_batch():
+    model = Model()
+    batcher = MicroBatcher("test", model, max_items=32, max_wait_ms=1, enabled=True)
+    assert batcher.submit(list("abcde"), max_items=2) == list("ABCDE")
+    assert [len(b) for b in model.batches] == [2, 2, 1]
+    batcher.stop()
+
+
+def test_bad_input_fails_only_its_caller():
+    model = Model()
+    batcher, release, first = blocked_batcher(model, max_items=2, max_wait_ms=10_000)
+    threads, results, errors = submit_in_threads(batcher, [["ok"], ["bad"]])
+    wait_for_queue(batcher, 2)
+    release.set()
+    for t in threads + [first]:
+        t.join(5)
+
+    failed = [i for i in (0, 1) if i in errors]
+    assert len(failed) == 1
+    assert isinstance(errors[failed[0]], ValueError)
+    assert list(results.values()) == [["OK"]]
+    assert batcher.stats()["errors"] == 1
+    batcher.stop()
+
+
+def test_disabled_batcher_runs_in_the_caller():
+    model = Model()
+    batcher = MicroBatcher("test", model, enabled=False)
+    assert batcher.submit(["a"]) == ["A"]
+    assert batcher.submit([]) == []
+    assert model.threads == {threading.current_thread().name}
+
+
+def test_stopped_batcher_runs_in_the_caller():
+    model = Model()
+    batcher = MicroBatcher("test", model, max_wait_ms=1, enabled=True)
+    batcher.submit(["a"])
+    batcher.stop()
+    assert batcher.submit(["b"]) == ["B"]
+    assert threading.current_thread().name in model.threads
+
+
+@pytest.mark.parametrize("max_items", [0, None])
+def test_no_hint_uses_the_batcher_limit(max_items):
+    model = Model()
+    batcher = MicroBatcher("test", model, max_items=3, max_wait_ms=1, enabled=True)
+    assert batcher.submit(list("abcd"), max_items=max_items) == list("ABCD")
+    # a single request larger than max_items still runs as one batch
+    assert model.batches == [list("abcd")]
+    batcher.stop()
@@ -0,0 +1,69 @@
+import sqlite3
+
+import migrations
+from db import connection
+
+
+def columns(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    finally:
+        conn.close()
+
+
+def test_fresh_database_reaches_latest_version(db_path):
+    latest = migrations.MIGRATIONS[-1][0]
+    assert migrations.current_version(db_path) == latest
+    assert all(m["applied_at"] for m in migrations.status(db_path))
+    for table in ("quizzes", "questions", "assignments", "students", "teachers",
+                  "grading_settings", "generation_jobs", "template_stats",
+                  "term_df", "term_docs", "uploads"):
+        assert columns(db_path, table), f"{table} missing"
+
+
+def test_migrate_is_idempotent(db_path):
+    assert migrations.migrate(db_path) == []
+    # a new process has no in-memory record and re-checks schema_version
+    migrations._migrated.discard(db_path)
+    assert migrations.migrate(db_path) == []
+    with connection(db_path) as conn:
+        versions = [r[0] for r in conn.execute("SELECT version FROM schema_version")]
+    assert versions == [v for v, _, _ in migrations.MIGRATIONS]
+
+
+def test_hot_queries_use_their_indexes(db_path):
+    report = migrations.check_query_plans(db_path)
+    assert {r["query"] for r in report} == set(migrations.HOT_QUERIES)
+    assert [r for r in report if not r["ok"]] == []
+
+
+def test_legacy_database_is_upgraded(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE quizzes (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                              topic TEXT NOT NULL, data TEXT NOT NULL,
+                              created_by TEXT DEFAULT 'admin',
+                              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        INSERT INTO quizzes (title, topic, data)
+            VALUES ('Cells', 'biology', '[["What is the powerhouse?", "Mitochondria"]]');
+        CREATE TABLE students (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               student_id TEXT UNIQUE NOT NULL, role TEXT DEFAULT 'student');
+        INSERT INTO students (student_id, role) VALUES ('t1', 'teacher'), ('s1', 'student');
+        CREATE TABLE generation_jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'queued',
+                                      params TEXT NOT NULL);
+    """)
+    conn.commit()
+    conn.close()
+
+    applied = migrations.migrate(path)
+    assert applied == [v for v, _, _ in migrations.MIGRATIONS]
+    assert {"code", "active", "version"} <= columns(path, "quizzes")
+    assert {"owner", "heartbeat_at"} <= columns(path, "generation_jobs")
+
+    with connection(path) as conn:
+        assert [r[0] for r in conn.execute("SELECT student_id FROM students")] == ["s1"]
+        assert [r[0] for r in conn.execute("SELECT teacher_id FROM teachers")] == ["t1"]
+        row = conn.execute("SELECT kind, answer_norm FROM questions WHERE quiz_id = 1").fetchone()
+    assert tuple(row) == ("open", "mitochondria")
@@ -1,48 +1,147 @@
-import json
-import re
-from typing import Dict
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline
+import os
+import time
+from model_registry import registry
+from nlp_cache import file_version
+from keyword_index import get_keyword_index
+from embedding_index import EmbeddingIndex, encode_texts
+from inference_scheduler import classify
+
+# embed "topic: kw1, kw2, ..." instead of the bare topic name
+EMBED_TOPIC_KEYWORDS = os.environ.get("TOPIC_EMBED_KEYWORDS", "0") == "1"
+EMBED_KEYWORDS_PER_TOPIC = 25
+
+# cascade mode: how many prefilter candidates reach the zero-shot classifier,
+# and the top-1/top-2 prefilter margin above which zero-shot is skipped
+CASCADE_TOP_K       = int(os.environ.get("CASCADE_TOP_K", "5"))
+CASCADE_SKIP_MARGIN = float(os.environ.get("CASCADE_SKIP_MARGIN", "0.15"))
 
 class TopicDetector:
     def __init__(self, topic_file: str = "topic_keywords_100plus_expanded.json"):
-        self.topic_keywords = self._load_topic_keywords(topic_file)
-        self.classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
-        self.topic_list = list(self.topic_keywords.keys())
+        self.topic_file = topic_file
+        self.topic_embeddings = EmbeddingIndex()
+
+    # the keyword file can change through /api/topics/add, so topics are
+    # always read from the (per-file-version) shared keyword index
+    @property
+    def topic_keywords(self):
+        return get_keyword_index(self.topic_file).topic_keywords
+
+    @property
+    def topic_list(self):
+        return get_keyword_index(self.topic_file).topics
+
+    @property
+    def keywords_version(self):
+        return file_version(self.topic_file)
+
+    # models are shared process-wide and loaded on first use
+    @property
+    def classifier(self):
+        return registry.get("bart-large-mnli")
 
-    def _load_topic_keywords(self, filepath: str) -> Dict[str, list]:
-        with open(filepath, 'r') as f:
-            return json.load(f)
+    @property
+    def embedder(self):
+        return registry.get("minilm")
+
+    def _topic_text(self, topic, keywords):
+        if not EMBED_TOPIC_KEYWORDS or not keywords:
+            return topic
+        return f"{topic}: {', '.join(keywords[:EMBED_KEYWORDS_PER_TOPIC])}"
+
+    def sync_topic_embeddings(self):
+        """Embed any topic not embedded yet (all of them on first call)."""
+        topic_keywords = self.topic_keywords
+        return self.topic_embeddings.sync(
+            (t, self._topic_text(t, kws)) for t, kws in topic_keywords.items()
+        )
+
+    def embedding_scores(self, text):
+        self.sync_topic_embeddings()
+        text_vec = encode_texts([text])[0]
+        topics, sims = self.topic_embeddings.score(text_vec)
+        return dict(zip(topics, sims.tolist()))
+
+    def keyword_scores(self, text):
+        # one pass over the text for all ~2,000 keywords
+        hits, named = get_keyword_index(self.topic_file).scan(text)
+        scores = {}
+        for topic in set(hits) | named:
+            score = len(hits.get(topic, ()))
+            if topic in named:
+                score += 3
+            scores[topic] = score
+        return scores
 
-    def detect_topics(self, text: str, method: str = "hybrid", top_n: int = 3) -> dict:
+    def _cascade(self, text, top_k, confidence_threshold):
+        """
+        Keyword + embedding prefilter picks the top_k candidate labels; only
+        those go to bart-large-mnli, and only when the prefilter is not
+        already confident (top-1 vs top-2 margin below the threshold).
+        """
+        timings = {}
+        t0 = time.perf_counter()
+        kw = self.keyword_scores(text)
+        timings["keywords"] = round(time.perf_counter() - t0, 4)
+
+        t0 = time.perf_counter()
+        emb = self.embedding_scores(text)
+        timings["embedding"] = round(time.perf_counter() - t0, 4)
+
+        kw_max = max(kw.values(), default=0) or 1
+        prefilter = {
+            t: 0.5 * kw.get(t, 0) / kw_max + 0.5 * max(0.0, emb.get(t, 0.0))
+            for t in set(kw) | set(emb)
+        }
+        ranked = sorted(prefilter.items(), key=lambda x: x[1], reverse=True)
+        candidates = [t for t, _ in ranked[:max(1, top_k)]]
+        margin = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else 1.0
+
+        scores = {t: prefilter[t] * 10 for t in candidates}
+        evaluated = 0
+        if len(candidates) > 1 and margin < confidence_threshold:
+            t0 = time.perf_counter()
+            z_result = classify(text, candidates)
+            timings["zero_shot"] = round(time.perf_counter() - t0, 4)
+            evaluated = len(candidates)
+            for label, score in zip(z_result["labels"], z_result["scores"]):
+                scores[label] += score * 10
+
+        info = {
+            "Timings":         timings,
+            "LabelsEvaluated": evaluated,
+            "ZeroShotSkipped": evaluated == 0,
+            "Confidence":      round(margin, 4),
+        }
+        return scores, info
+
+    def detect_topics(self, text: str, method: str = "hybrid", top_n: int = 3,
+                      top_k: int = CASCADE_TOP_K,
+                      confidence_threshold: float = CASCADE_SKIP_MARGIN) -> dict:
         text = text.lower()
-        topic_scores = {}
         scores = {}
+        cascade_info = None
 
         if method in ["hybrid", "keywords"]:
-            for topic, keywords in self.topic_keywords.items():
-                matches = [k for k in set(keywords) if re.search(r'\b' + re.escape(k.lower()) + r'\b', text)]
-                score = len(matches)
-                if topic.lower() in text:
-                    score += 3
-                if score > 0:
-                    scores[topic] = score
+            scores.update(self.keyword_scores(text))
+
+        if method == "cascade":
+            scores, cascade_info = self._cascade(text, top_k, confidence_threshold)
 
         if method in ["hybrid", "zero-shot"]:
-            z_result = self.classifier(text, self.topic_list)
+            z_result = classify(text, self.topic_list)
             for label, score in zip(z_result["labels"], z_result["scores"]):
                 scores[label] = scores.get(label, 0) + int(score * 10)
 
         if method == "embedding":
-            text_vec = self.embedder.encode(text, convert_to_tensor=True)
-            topic_vecs = self.embedder.encode(self.topic_list, convert_to_tensor=True)
-            cos_sim = util.cos_sim(text_vec, topic_vecs)[0]
-            for idx, topic in enumerate(self.topic_list):
-                scores[topic] = float(cos_sim[idx]) * 10
+            # precomputed topic matrix: one matrix-vector product per request
+            for topic, sim in self.embedding_scores(text).items():
+                scores[topic] = sim * 10
 
         if not scores:
-            return {"Primary": "General", "Scores": {}}
+            result = {"Primary": "General", "Scores": {}}
+            if cascade_info:
+                result.update(cascade_info)
+            return result
 
         sorted_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)
         top_matches = sorted_scores[:top_n]
@@ -53,5 +152,7 @@ class TopicDetector:
         }
         if len(top_matches) > 1: result["Secondary"] = top_matches[1][0]
         if len(top_matches) > 2: result["Tertiary"] = top_matches[2][0]
-        
+        if cascade_info:
+            result.update(cascade_info)
+
         return result
@@ -1,29 +1,225 @@
+import codecs
+import hashlib
+import itertools
+import json
+import multiprocessing
 import os
-from flask import request, jsonify
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import request, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import fitz  # PyMuPDF
 import docx
+from pdf_worker import pdf_pages_text
+from term_stats import term_stats
+from upload_store import upload_store
 
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
 
+# uploads larger than this are rejected; smaller ones stay in memory up to
+# UPLOAD_SPOOL_BYTES before spilling to a temp file
+UPLOAD_MAX_BYTES    = int(os.environ.get("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES  = int(os.environ.get("UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+# extracted text is cut off (and flagged truncated) past this many characters
+UPLOAD_MAX_CHARS    = int(os.environ.get("UPLOAD_MAX_CHARS", "2000000"))
+# PDFs with at least this many selected pages are split across a process pool
+PDF_PARALLEL_PAGES  = int(os.environ.get("PDF_PARALLEL_PAGES", "40"))
+PDF_PAGES_PER_TASK  = int(os.environ.get("PDF_PAGES_PER_TASK", "16"))
+PDF_WORKERS         = int(os.environ.get("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(filepath):
-    text = ""
-    doc = fitz.open(filepath)
-    for page in doc:
-        text += page.get_text()
-    return text
+class UploadTooLarge(Exception):
+    pass
+
+def parse_page_range(spec, page_count):
+    """
+    "1-3,7,10-" -> [0, 1, 2, 6, 9, ..., page_count - 1] (1-based, inclusive,
+    open-ended ranges allowed). Empty spec selects every page.
+    """
+    if not spec:
+        return list(range(page_count))
+    pages = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            lo = int(lo) if lo.strip() else 1
+            hi = int(hi) if hi.strip() else page_count
+        else:
+            lo = hi = int(part)
+        if lo < 1 or hi < lo:
+            raise ValueError(f"Invalid page range '{part}'")
+        pages.extend(range(lo - 1, min(hi, page_count)))
+    # keep document order, drop repeats
+    return sorted(set(pages))
+
+# ─── EXTRACTORS ──────────────────────────────────────────────────────────────
+# Each yields text pieces in document order instead of building one string;
+# the PDF extractor yields exactly one piece per page.
+
+_pool_lock = threading.Lock()
+_pool = None
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: this process is threaded and has torch loaded
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def iter_text_from_pdf(fileobj, pages=None):
+    data = fileobj.read()
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        selected = parse_page_range(pages, doc.page_count)
+        if PDF_WORKERS <= 1 or len(selected) < PDF_PARALLEL_PAGES:
+            for i in selected:
+                yield doc[i].get_text()
+            return
+
+    # workers open the file themselves; a fitz document cannot be pickled
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        del data
+        tasks = [
+            selected[i : i + PDF_PAGES_PER_TASK]
+            for i in range(0, len(selected), PDF_PAGES_PER_TASK)
+        ]
+        # map() hands results back in page order as they complete
+        for texts in _get_pool().map(pdf_pages_text, [path] * len(tasks), tasks):
+            yield from texts
+    finally:
+        os.remove(path)
+
+def iter_text_from_docx(fileobj, pages=None):
+    doc = docx.Document(fileobj)
+    for i, para in enumerate(doc.paragraphs):
+        yield ("\n" if i else "") + para.text
+
+def iter_text_from_txt(fileobj, pages=None, chunk_size=64 * 1024):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = fileobj.read(chunk_size)
+        piece = decoder.decode(chunk, final=not chunk)
+        if piece:
+            yield piece
+        if not chunk:
+            break
+
+EXTRACTORS = {
+    "pdf":  iter_text_from_pdf,
+    "docx": iter_text_from_docx,
+    "txt":  iter_text_from_txt,
+}
+
+# whole-file helpers, kept for callers that want a plain string
+def extract_text_from_pdf(filepath, pages=None):
+    with open(filepath, "rb") as f:
+        return "".join(iter_text_from_pdf(f, pages))
 
 def extract_text_from_docx(filepath):
-    doc = docx.Document(filepath)
-    return "\n".join([para.text for para in doc.paragraphs])
+    with open(filepath, "rb") as f:
+        return "".join(iter_text_from_docx(f))
 
 def extract_text_from_txt(filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
         return f.read()
 
+def validate_txt(fileobj, chunk_size=1024 * 1024):
+    """Raise UnicodeDecodeError unless the whole file is valid UTF-8; rewinds it."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = fileobj.read(chunk_size)
+        decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            break
+    fileobj.seek(0)
+
+def spool_upload(stream, max_bytes=UPLOAD_MAX_BYTES, chunk_size=1024 * 1024):
+    """
+    Copy an upload stream into a spooled temp file, enforcing max_bytes.
+    Returns (spool, sha256 hex digest, size).
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            spool.close()
+            raise UploadTooLarge(f"File exceeds the {max_bytes} byte upload limit")
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
+
+def stream_text_response(pieces, max_chars=UPLOAD_MAX_CHARS, on_done=None, extra=None,
+                         truncated=False):
+    """
+    Streams `{"text": "...", "truncated": bool}` as the pieces arrive. The
+    JSON is only complete at the end, so clients that read the whole body
+    see the same shape as before. The first piece is pulled before the
+    response starts, so a file that cannot be opened still gets a 500; an
+    extraction error further in ends the object with an "error" field.
+    `truncated` marks pieces that were already cut off (cached text).
+    """
+    pieces = iter(pieces)
+    try:
+        first = [next(pieces)]
+    except StopIteration:
+        first = []
+    except Exception as e:
+        close = getattr(pieces, "close", None)
+        if close:
+            close()
+        return jsonify({"error": f"Failed to extract text: {str(e)}"}), 500
+
+    def generate():
+        sent, parts, cut, error = 0, [], False, None
+        yield '{"text": "'
+        try:
+            for piece in itertools.chain(first, pieces):
+                if sent + len(piece) > max_chars:
+                    piece, cut = piece[: max_chars - sent], True
+                if piece:
+                    sent += len(piece)
+                    parts.append(piece)
+                    # json-escape the piece, minus its surrounding quotes
+                    yield json.dumps(piece)[1:-1]
+                if cut:
+                    break
+        except Exception as e:
+            error = f"Failed to extract text: {str(e)}"
+        finally:
+            close = getattr(pieces, "close", None)
+            if close:
+                close()
+        tail = {"truncated": truncated or cut, "chars": sent, **(extra or {})}
+        if error:
+            tail["error"] = error
+        yield '", ' + json.dumps(tail)[1:]
+        if on_done and not error:
+            try:
+                on_done("".join(parts), truncated or cut)
+            except Exception as e:
+                print(f"[WARN] Post-upload bookkeeping failed: {e}")
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
 def handle_file_upload(app):
     @app.route("/api/upload", methods=["POST"])
     def upload_file():
@@ -36,24 +232,82 @@ def handle_file_upload(app):
 
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            save_path = os.path.join("uploads", filename)
-            os.makedirs("uploads", exist_ok=True)
-            file.save(save_path)
-
             ext = filename.rsplit(".", 1)[1].lower()
+            extractor = EXTRACTORS.get(ext)
+            if extractor is None:
+                return jsonify({"error": "Unsupported file type"}), 400
 
             try:
-                if ext == "pdf":
-                    text = extract_text_from_pdf(save_path)
-                elif ext == "docx":
-                    text = extract_text_from_docx(save_path)
-                elif ext == "txt":
-                    text = extract_text_from_txt(save_path)
-                else:
-                    return jsonify({"error": "Unsupported file type"}), 400
-
-                return jsonify({"text": text})
-            except Exception as e:
-                return jsonify({"error": f"Failed to extract text: {str(e)}"}), 500
+                spool, digest, size = spool_upload(file.stream)
+            except UploadTooLarge as e:
+                return jsonify({"error": str(e)}), 413
+
+            pages = request.args.get("pages") or request.form.get("pages")
+            if ext != "pdf":
+                pages = None
+            meta = upload_store.put(spool, digest, ext, size, original_name=filename)
+            extra = {"sha256": digest, "page_count": meta["page_count"]}
+
+            # repeat upload: answer from the cached extraction
+            if meta["text"] is not None and not (pages and meta["truncated"]):
+                spool.close()
+                text = meta["text"]
+                if pages:
+                    try:
+                        selected = parse_page_range(pages, meta["page_count"])
+                    except ValueError as e:
+                        return jsonify({"error": str(e)}), 400
+                    text = "".join(upload_store.cached_pages(meta, selected))
+                return stream_text_response(
+                    iter([text]), extra={**extra, "cached": True},
+                    truncated=bool(meta["truncated"])
+                )
+
+            page_count = None
+            if ext == "txt":
+                try:
+                    validate_txt(spool)
+                except UnicodeDecodeError as e:
+                    spool.close()
+                    return jsonify({"error": f"Failed to extract text: {str(e)}"}), 400
+            if ext == "pdf":
+                # validate the range up front, while a 400 can still be sent
+                try:
+                    with fitz.open(stream=spool.read(), filetype="pdf") as doc:
+                        page_count = doc.page_count
+                        parse_page_range(pages, page_count)
+                    spool.seek(0)
+                except ValueError as e:
+                    spool.close()
+                    return jsonify({"error": str(e)}), 400
+                except Exception as e:
+                    spool.close()
+                    return jsonify({"error": f"Failed to extract text: {str(e)}"}), 500
+                extra["page_count"] = page_count
+
+            lengths, started = [], time.perf_counter()
+            def pieces():
+                try:
+                    for piece in extractor(spool, pages):
+                        lengths.append(len(piece))
+                        yield piece
+                finally:
+                    spool.close()
+
+            def on_done(text, truncated):
+                # only whole-document extractions are cached
+                if not pages:
+                    offsets = None
+                    if ext == "pdf":
+                        offsets = [0]
+                        for n in lengths:
+                            offsets.append(min(offsets[-1] + n, len(text)))
+                    upload_store.save_extraction(
+                        digest, text, page_count=page_count, page_offsets=offsets,
+                        truncated=truncated, seconds=round(time.perf_counter() - started, 3)
+                    )
+                term_stats.add_document_async(text)
+
+            return stream_text_response(pieces(), on_done=on_done, extra={**extra, "cached": False})
 
         return jsonify({"error": "Invalid file"}), 400
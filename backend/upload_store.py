@@ -0,0 +1,149 @@
+# backend/upload_store.py
+"""
+Content-addressed store for uploaded documents.
+
+Each upload is kept once under UPLOAD_STORE_DIR/<sha[:2]>/<sha>.<ext>, no
+matter how often or under which name it is uploaded. The `uploads` table in
+quizzes.db records the blob plus its cached extraction: full text, PDF page
+offsets (so a pages= request can be answered by slicing), page count and how
+long extraction took. Blobs unused for UPLOAD_GC_DAYS, or the least recently
+used ones once the store outgrows UPLOAD_STORE_MAX_BYTES, are removed by gc().
+
+    python upload_store.py gc
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+from db import DB_PATH, connection, transaction
+from migrations import migrate
+
+UPLOAD_STORE_DIR       = os.environ.get("UPLOAD_STORE_DIR", "uploads")
+UPLOAD_GC_DAYS         = float(os.environ.get("UPLOAD_GC_DAYS", "90"))
+UPLOAD_STORE_MAX_BYTES = int(os.environ.get("UPLOAD_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+# at most one opportunistic gc run per interval
+UPLOAD_GC_INTERVAL     = float(os.environ.get("UPLOAD_GC_INTERVAL", "3600"))
+
+
+class UploadStore:
+    def __init__(self, root=UPLOAD_STORE_DIR, db_path=DB_PATH):
+        self.root     = root
+        self.db_path  = db_path
+        self._lock    = threading.Lock()
+        self._ready   = False
+        self._last_gc = 0.0
+
+    def _ensure_table(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            # the uploads table is created by migration 9
+            migrate(self.db_path)
+            self._ready = True
+
+    def blob_path(self, sha256, ext):
+        return os.path.join(self.root, sha256[:2], f"{sha256}.{ext}")
+
+    # ─── BLOBS ───────────────────────────────────────────────────────────────
+    def put(self, fileobj, sha256, ext, size, original_name=None):
+        """
+        Store `fileobj` under its hash unless that blob already exists.
+        Returns the metadata row (with any cached extraction).
+        """
+        path = self.blob_path(sha256, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fileobj.seek(0)
+            with open(tmp, "wb") as out:
+                shutil.copyfileobj(fileobj, out)
+            os.replace(tmp, path)
+            fileobj.seek(0)
+
+        self._ensure_table()
+        with transaction(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO uploads (sha256, ext, size, original_name, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sha256, ext, size, original_name, time.time())
+            )
+            conn.execute(
+                "UPDATE uploads SET hits = hits + 1, last_used_at = ? WHERE sha256 = ?",
+                (time.time(), sha256)
+            )
+            row = conn.execute("SELECT * FROM uploads WHERE sha256 = ?", (sha256,)).fetchone()
+        self.maybe_gc()
+        return dict(row)
+
+    def save_extraction(self, sha256, text, page_count=None, page_offsets=None,
+                        truncated=False, seconds=None):
+        self._ensure_table()
+        with transaction(self.db_path) as conn:
+            conn.execute(
+                "UPDATE uploads SET text = ?, page_count = ?, page_offsets = ?, "
+                "truncated = ?, extract_seconds = ? WHERE sha256 = ?",
+                (text, page_count,
+                 json.dumps(page_offsets) if page_offsets is not None else None,
+                 int(bool(truncated)), seconds, sha256)
+            )
+
+    @staticmethod
+    def cached_pages(meta, page_numbers):
+        """Text of the given 0-based pages, sliced from a cached PDF extraction."""
+        offsets = json.loads(meta["page_offsets"])
+        text = meta["text"]
+        return [text[offsets[i]:offsets[i + 1]] for i in page_numbers if i + 1 < len(offsets)]
+
+    # ─── GARBAGE COLLECTION ──────────────────────────────────────────────────
+    def gc(self, max_age_days=UPLOAD_GC_DAYS, max_bytes=UPLOAD_STORE_MAX_BYTES):
+        """Drop blobs unused for max_age_days, then LRU blobs beyond max_bytes."""
+        self._ensure_table()
+        with connection(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT sha256, ext, size, last_used_at FROM uploads ORDER BY last_used_at ASC"
+            ).fetchall()
+        cutoff = time.time() - max_age_days * 86400
+        total = sum(r["size"] for r in rows)
+        doomed = []
+        for r in rows:
+            if (r["last_used_at"] or 0) < cutoff or total > max_bytes:
+                doomed.append(r)
+                total -= r["size"]
+
+        for r in doomed:
+            try:
+                os.remove(self.blob_path(r["sha256"], r["ext"]))
+            except FileNotFoundError:
+                pass
+        with transaction(self.db_path) as conn:
+            conn.executemany("DELETE FROM uploads WHERE sha256 = ?", [(r["sha256"],) for r in doomed])
+        self._last_gc = time.time()
+        return {"removed": len(doomed), "freed_bytes": sum(r["size"] for r in doomed)}
+
+    def maybe_gc(self):
+        """Run gc() in the background at most once per UPLOAD_GC_INTERVAL."""
+        if time.time() - self._last_gc < UPLOAD_GC_INTERVAL:
+            return
+        self._last_gc = time.time()
+
+        def _run():
+            try:
+                self.gc()
+            except Exception as e:
+                print(f"[WARN] Upload store gc failed: {e}")
+        threading.Thread(target=_run, daemon=True).start()
+
+
+upload_store = UploadStore()
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["gc"]:
+        print(upload_store.gc())
+    else:
+        print("usage: python upload_store.py gc")
@@ -1,17 +1,19 @@
 from flask import request, jsonify, send_file
-import sqlite3, json
+import json
 from fpdf import FPDF
+from nlp_cache import cache
+from db import connection
+from queries import QUIZ_ASSIGNEES, STUDENT_QUIZZES
+from quiz_model import assign_quizzes
 
 def register_util_routes(app):
     @app.route("/api/quiz/<int:quiz_id>/report", methods=["GET"])
     def download_report(quiz_id):
-        conn = sqlite3.connect("quizzes.db")
-        c = conn.cursor()
-        c.execute("SELECT title, topic, data FROM quizzes WHERE id=?", (quiz_id,))
-        quiz = c.fetchone()
-        c.execute("SELECT student_id FROM assignments WHERE quiz_id=?", (quiz_id,))
-        students = [r[0] for r in c.fetchall()]
-        conn.close()
+        with connection() as conn:
+            quiz = conn.execute(
+                "SELECT title, topic, data FROM quizzes WHERE id=?", (quiz_id,)
+            ).fetchone()
+            students = [r[0] for r in conn.execute(QUIZ_ASSIGNEES, (quiz_id,))]
 
         pdf = FPDF()
         pdf.add_page()
@@ -30,40 +32,13 @@ def register_util_routes(app):
         student_id = data.get("student_id")
         due_at     = data.get("due_at")
         time_limit = data.get("time_limit")
-        conn = sqlite3.connect("quizzes.db")
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO assignments (quiz_id, student_id, due_at, time_limit) VALUES (?, ?, ?, ?)",
-            (quiz_id, student_id, due_at, time_limit)
-        )
-        conn.commit()
-        conn.close()
+        assign_quizzes([quiz_id], student_ids=[student_id], due_at=due_at, time_limit=time_limit)
         return jsonify({"status":"assigned"}), 201
 
     @app.route("/api/student/<student_id>/quizzes", methods=["GET"])
     def student_quizzes_with_due(student_id):
-        conn = sqlite3.connect("quizzes.db")
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("""
-          SELECT
-            q.id           AS quiz_id,
-            q.title        AS title,
-            q.topic        AS topic,
-            a.assigned_at  AS assigned_at,
-            a.due_at       AS due_at,
-            a.status       AS status,
-            a.score        AS score,
-            a.submitted_at AS submitted_at,
-            a.time_limit   AS time_limit,
-            a.id           AS assignment_id
-          FROM quizzes q
-          JOIN assignments a ON a.quiz_id = q.id
-          WHERE a.student_id = ?
-          ORDER BY a.assigned_at DESC
-        """, (student_id,))
-        rows = c.fetchall()
-        conn.close()
+        with connection() as conn:
+            rows = conn.execute(STUDENT_QUIZZES, (student_id,)).fetchall()
 
         out = []
         for r in rows:
@@ -80,3 +55,13 @@ def register_util_routes(app):
                 "assignment_id": r["assignment_id"],
             })
         return jsonify(out), 200
+
+    # ─── NLP CACHE ───────────────────────────────────────────────────────────
+    @app.route("/api/cache/stats", methods=["GET"])
+    def nlp_cache_stats():
+        return jsonify(cache.stats()), 200
+
+    @app.route("/api/cache", methods=["DELETE"])
+    def clear_nlp_cache():
+        cache.clear()
+        return jsonify({"status": "cleared"}), 200
@@ -127,13 +127,17 @@ export default function QuizDashboard({ onEdit }) {
     }
     setModalStudentError("");
     try {
-      await axios.post("/api/quiz/assign", {
+      const res = await axios.post("/api/quiz/assign", {
         quiz_id: selectedQuizForStudent,
         student_id: id,
         due_at: modalDueAt,
         time_limit: Number(modalTimeLimit) * 60,
       });
-      showToast(`Assigned to student ${id} successfully`, "success");
+      if (res.data.status === "already_assigned") {
+        showToast(`Student ${id} already has this quiz`, "warning");
+      } else {
+        showToast(`Assigned to student ${id} successfully`, "success");
+      }
       closeStudentModal();
     } catch {
       showToast("Assignment failed", "error");
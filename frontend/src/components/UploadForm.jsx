@@ -119,10 +119,23 @@ export default function UploadForm({ setTopic, setSummary, setQuestions }) {
         const up = await axios.post("/api/upload", fd, {
           headers: { "Content-Type": "multipart/form-data" },
         });
+        // extraction can still fail after the response has started streaming
+        if (up.data.error) {
+          showToast(`Upload failed: ${up.data.error}`, "error");
+          setLoading(false);
+          return;
+        }
         content = up.data.text;
         setText(content);
-      } catch {
-        showToast("Upload failed", "error");
+        if (up.data.truncated) {
+          showToast(
+            "The document was too long; only its beginning will be used.",
+            "warning"
+          );
+        }
+      } catch (err) {
+        const msg = err.response?.data?.error;
+        showToast(msg ? `Upload failed: ${msg}` : "Upload failed", "error");
         setLoading(false);
         return;
       }